@@ -0,0 +1,68 @@
+"""
+In-process response caches shared by the agents.
+"""
+
+from typing import Any, Optional
+from collections import OrderedDict
+import copy
+import hashlib
+import json
+import re
+import time
+
+
+def make_cache_key(payload: Any) -> str:
+    """Build a stable hash key from a JSON-serializable payload."""
+    serialized = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(serialized.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class TTLCache:
+    """Small LRU cache whose entries expire after `ttl` seconds.
+
+    Values are deep-copied on the way in and out so callers can mutate
+    what they get back (the agents pop keys such as token_usage) without
+    corrupting the cached entry.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+# Words dropped when comparing questions: they do not change what is asked
+_FILLER_WORDS = frozenset(('a', 'an', 'the', 'please'))
+
+
+def normalized_words(text: str) -> tuple:
+    """Lower-cased words of text in order, without articles.
+
+    Two questions with the same normalized words differ only in case,
+    punctuation, spacing or articles. Word order and negations still count.
+    """
+    return tuple(word for word in _TOKEN_RE.findall(text.lower()) if word not in _FILLER_WORDS)
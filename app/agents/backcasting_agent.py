@@ -1,14 +1,145 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from .base_agent import BaseAgent
+import asyncio
+import io
 import json
-import re
+import os
+import hashlib
 import logging
+from dataclasses import dataclass
+from operator import itemgetter
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional; fall back to the stdlib parser
+    _json_loads = json.loads
 
 logger = logging.getLogger(__name__)
 
-class BackcastingAgent(BaseAgent):
-    def get_system_prompt(self) -> str:
-        return """You are the Backcasting Agent, a strategic prioritization specialist tasked with ranking immediate action items from highest to lowest priority to guide sequencing, resource allocation, and strategic focus.
+# Marker found in an initiative's time_horizon -> action bucket index, tried in order
+_HORIZON_MARKERS = (("Near-Term", 0), ("Medium-Term", 1), ("Long-Term", 2))
+
+_FALLBACK_JUSTIFICATION_SUFFIX = "... Given its strategic importance and operational feasibility, this task has been prioritized to ensure effective implementation."
+
+_HORIZON_KEYS = ('near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization')
+_HORIZON_LABELS = ("Near-Term (0-2 years)", "Medium-Term (2-5 years)", "Long-Term (5-10 years)")
+# Markdown section headings used by format_output
+_OUTPUT_SECTIONS = tuple(zip(_HORIZON_KEYS, ('Near-Term (0–2 years)', 'Medium-Term (2–5 years)', 'Long-Term (5–10 years)')))
+
+# Generic prioritization used when there are no tasks to rank at all
+_FALLBACK_PRIORITIZATION = {
+    'near_term_prioritization': [
+        {
+            'rank': 1,
+            'title': 'Define strategic implementation framework',
+            'justification': 'High urgency to establish foundation for all strategic initiatives. High impact as it enables subsequent actions. Highly feasible with current resources and organizational capabilities.'
+        }
+    ],
+    'medium_term_prioritization': [
+        {
+            'rank': 1,
+            'title': 'Execute strategic initiatives based on near-term foundations',
+            'justification': 'Medium urgency following near-term setup phase. High impact on achieving strategic goals. Feasible with capabilities developed in near-term phase.'
+        }
+    ],
+    'long_term_prioritization': [
+        {
+            'rank': 1,
+            'title': 'Sustain and scale strategic outcomes',
+            'justification': 'Lower immediate urgency but essential for long-term sustainability. Very high long-term impact on organizational success. Feasible with systems and processes established in earlier phases.'
+        }
+    ]
+}
+
+
+def _prioritization_schema(keys) -> Dict[str, Any]:
+    """Gemini response_schema (OpenAPI subset) for the given prioritization lists"""
+    item_schema = {
+        "type": "OBJECT",
+        "properties": {
+            "rank": {"type": "INTEGER"},
+            "title": {"type": "STRING"},
+            "justification": {"type": "STRING"}
+        },
+        "required": ["rank", "title", "justification"]
+    }
+    return {
+        "type": "OBJECT",
+        "properties": {key: {"type": "ARRAY", "items": item_schema} for key in keys},
+        "required": list(keys)
+    }
+
+
+_HORIZON_SCHEMAS = {key: _prioritization_schema((key,)) for key in _HORIZON_KEYS}
+
+_rank_of = itemgetter('rank')
+_rank_title_justification = itemgetter('rank', 'title', 'justification')
+
+
+@dataclass(slots=True)
+class ActionItem:
+    """An immediate task from a High-Impact initiative, with the initiative's context"""
+    task: str
+    initiative: str
+    why_important: str
+    who_it_impacts: str
+    estimated_cost: str
+
+
+def _normalize_prioritization(prioritization: Dict[str, Any]) -> Dict[str, Any]:
+    """Sort each horizon's parsed items by rank and fill in missing fields, in place.
+
+    Runs once at parse time so format_output can rely on every item having
+    rank, title and justification.
+    """
+    for key in _HORIZON_KEYS:
+        items = prioritization.get(key)
+        if not isinstance(items, list):
+            continue
+        items[:] = [item for item in items if isinstance(item, dict)]
+        try:
+            items.sort(key=_rank_of)
+        except (KeyError, TypeError):
+            # LLM output occasionally omits a rank; those items go last
+            items.sort(key=lambda x: x.get('rank', 999))
+        for item in items:
+            item.setdefault('rank', 'N/A')
+            item.setdefault('title', 'Untitled Action')
+            item.setdefault('justification', 'No justification provided')
+    return prioritization
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _decode_first_json_object(text: str) -> Optional[Any]:
+    """Decode the first JSON object in an LLM response, or return None.
+
+    Prefers the body of a ```json fence, otherwise the response itself when it
+    starts with '{'. The fenced body is cut out with str.partition and handed to
+    the fast loader; if that fails (say a ``` inside a string value cut it short)
+    raw_decode reads the object from its first '{', stopping at its end.
+    """
+    before, fence, after = text.partition('```json')
+    if fence:
+        body, closing, _ = after.partition('```')
+        if closing:
+            try:
+                return _json_loads(body)
+            except json.JSONDecodeError:
+                pass
+        start = text.find('{', len(before) + len(fence))
+    else:
+        stripped = text.lstrip()
+        start = len(text) - len(stripped) if stripped.startswith('{') else -1
+    if start == -1:
+        return None
+    data, _ = _JSON_DECODER.raw_decode(text, start)
+    return data
+
+
+_BACKCASTING_SYSTEM_PROMPT = """You are the Backcasting Agent, a strategic prioritization specialist tasked with ranking immediate action items from highest to lowest priority to guide sequencing, resource allocation, and strategic focus.
 
 Your mission is to:
 - Evaluate all immediate action items from the High-Impact Initiatives Agent.
@@ -86,376 +217,318 @@ Guidelines for the Agent
 * Be strategic – Always very briefly explain why a task ranks where it does in relation to strategic momentum and long-term objectives.
 * Be practical – Avoid abstract reasoning; focus on operational sequencing and execution feasibility."""
 
-    def format_prompt(self, input_data: Dict[str, Any]) -> str:
-        strategic_question = input_data.get('strategic_question', 'N/A')
+
+class BackcastingAgent(BaseAgent):
+    # Slots for the per-run state this agent adds; BaseAgent declares its own
+    __slots__ = (
+        'near_term_actions', 'medium_term_actions', 'long_term_actions', '_has_any_actions'
+    )
+
+    def get_system_prompt(self) -> str:
+        return _BACKCASTING_SYSTEM_PROMPT
+
+    def _write_actions(self, buf: io.StringIO, actions: List[ActionItem], horizon_name: str) -> None:
+        """Write one horizon's action items for the prompt into buf"""
+        if not actions:
+            buf.write(f"\n{horizon_name} Actions: None identified")
+            return
         
+        buf.write(f"\n{horizon_name} Actions:")
+        for i, action in enumerate(actions, 1):
+            buf.write(f"\n{i}. {action.task}\n   From Initiative: {action.initiative}\n   Context: {action.why_important[:100]}...")
+
+    def _extract_actions_by_horizon(self, execution_ready_initiatives: List[Dict[str, Any]]) -> Tuple[List[ActionItem], List[ActionItem], List[ActionItem]]:
+        """Split the initiatives' immediate tasks into near/medium/long-term action lists"""
+        buckets = ([], [], [])
+        
+        for initiative in execution_ready_initiatives:
+            get = initiative.get
+            time_horizon = get('time_horizon', '').strip()
+            immediate_tasks = get('immediate_tasks', ())
+            initiative_title = get('title', 'Untitled Initiative')
+            
+            logger.debug("  Initiative: %s | Time Horizon: %s | Immediate Tasks: %d",
+                         initiative_title, time_horizon, len(immediate_tasks))
+            
+            # Horizons arrive as e.g. "Near-Term", "Near-Term (0-2 years)" or "(0-2) Near-Term"
+            bucket_index = next((index for marker, index in _HORIZON_MARKERS if marker in time_horizon), None)
+            if bucket_index is None:
+                continue
+            bucket = buckets[bucket_index]
+            
+            # Add each immediate task with context; the context is the same for every
+            # task of an initiative, so read it once
+            why_important = get('why_important', '')
+            who_it_impacts = get('who_it_impacts', '')
+            estimated_cost = get('estimated_cost', '')
+            bucket.extend(
+                ActionItem(task, initiative_title, why_important, who_it_impacts, estimated_cost)
+                for task in immediate_tasks
+            )
+        
+        return buckets
+
+    def _extract_actions(self, input_data: Dict[str, Any]) -> None:
+        """Store the High-Impact initiatives' immediate tasks by time horizon on self"""
         # Extract High-Impact Initiatives Agent output
         high_impact_data = input_data.get('high_impact', {}).get('data', {})
         execution_ready_initiatives = high_impact_data.get('execution_ready_initiatives', [])
         
-        print(f"🔍 Backcasting format_prompt: Found {len(execution_ready_initiatives)} initiatives")
+        logger.debug("🔍 Backcasting: Found %d initiatives", len(execution_ready_initiatives))
         
         # Extract immediate action items organized by time horizon
         # Store as instance variables so we can use them for fallback later
-        self.near_term_actions = []
-        self.medium_term_actions = []
-        self.long_term_actions = []
+        self.near_term_actions, self.medium_term_actions, self.long_term_actions = \
+            self._extract_actions_by_horizon(execution_ready_initiatives)
+        self._has_any_actions = bool(self.near_term_actions or self.medium_term_actions or self.long_term_actions)
         
-        for initiative in execution_ready_initiatives:
-            time_horizon = initiative.get('time_horizon', '').strip()
-            immediate_tasks = initiative.get('immediate_tasks', [])
-            initiative_title = initiative.get('title', 'Untitled Initiative')
+        logger.debug("📊 Actions extracted: Near=%d, Medium=%d, Long=%d",
+                     len(self.near_term_actions), len(self.medium_term_actions), len(self.long_term_actions))
+
+    def format_prompt(self, input_data: Dict[str, Any]) -> str:
+        """The per-horizon prompts that process sends, one after the other"""
+        self._extract_actions(input_data)
+        strategic_question = input_data.get('strategic_question', 'N/A')
+        return "\n\n".join(
+            self._horizon_prompt(strategic_question, horizon_key, horizon_label, actions)
+            for horizon_key, horizon_label, actions in zip(_HORIZON_KEYS, _HORIZON_LABELS, self._horizon_actions())
+            if actions
+        )
+
+    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            self._extract_actions(input_data)
             
-            print(f"  Initiative: {initiative_title}")
-            print(f"    Time Horizon: {time_horizon}")
-            print(f"    Immediate Tasks: {len(immediate_tasks)}")
+            # Nothing to rank: skip the LLM and return the generic fallback right away
+            if not self._has_any_actions:
+                return self._empty_result()
             
-            # Add each immediate task with context
-            for task in immediate_tasks:
-                task_item = {
-                    'task': task,
-                    'initiative': initiative_title,
-                    'context': {
-                        'why_important': initiative.get('why_important', ''),
-                        'who_it_impacts': initiative.get('who_it_impacts', ''),
-                        'estimated_cost': initiative.get('estimated_cost', '')
-                    }
-                }
-                
-                if 'Near-Term' in time_horizon:
-                    self.near_term_actions.append(task_item)
-                elif 'Medium-Term' in time_horizon:
-                    self.medium_term_actions.append(task_item)
-                elif 'Long-Term' in time_horizon:
-                    self.long_term_actions.append(task_item)
-        
-        print(f"📊 Actions extracted: Near={len(self.near_term_actions)}, Medium={len(self.medium_term_actions)}, Long={len(self.long_term_actions)}")
-        
-        # Format actions for the prompt
-        def format_actions(actions, horizon_name):
-            if not actions:
-                return f"\n{horizon_name} Actions: None identified"
+            return await self._prioritize(input_data)
             
-            text = f"\n{horizon_name} Actions:"
-            for i, action in enumerate(actions, 1):
-                text += f"\n{i}. {action['task']}"
-                text += f"\n   From Initiative: {action['initiative']}"
-                text += f"\n   Context: {action['context']['why_important'][:100]}..."
-            return text
+        except Exception as e:
+            logger.error("Error in BackcastingAgent: %s", e)
+            return {
+                "status": "error",
+                "error": str(e),
+                "agent_type": self.__class__.__name__
+            }
+
+    async def _prioritize(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Rank each horizon with its own, smaller LLM call, issued concurrently.
+
+        A horizon whose call fails, or whose response yields no ranked items,
+        is ranked directly from its tasks, the other horizons keep their LLM
+        ranking; if every call fails the first error is raised.
+        """
+        horizons = list(zip(_HORIZON_KEYS, _HORIZON_LABELS, self._horizon_actions()))
+        ranked = await asyncio.gather(*(
+            self._rank_horizon(input_data, horizon_key, horizon_label, actions)
+            for horizon_key, horizon_label, actions in horizons
+        ), return_exceptions=True)
         
-        near_term_text = format_actions(self.near_term_actions, "Near-Term (0-2 years)")
-        medium_term_text = format_actions(self.medium_term_actions, "Medium-Term (2-5 years)")
-        long_term_text = format_actions(self.long_term_actions, "Long-Term (5-10 years)")
+        failures = [result for result, (_, _, actions) in zip(ranked, horizons)
+                    if actions and isinstance(result, BaseException)]
+        if failures and len(failures) == sum(1 for _, _, actions in horizons if actions):
+            raise failures[0]
+        
+        prioritization_data = {}
+        responses = []
+        token_usage = 0
+        for (horizon_key, horizon_label, actions), result in zip(horizons, ranked):
+            if isinstance(result, BaseException):
+                logger.error("Backcasting %s call failed, ranking its tasks directly: %s", horizon_label, result)
+                prioritization_data[horizon_key] = self._items_from_actions(actions)
+                continue
+            items, horizon_tokens, horizon_response = result
+            if actions and not items:
+                logger.warning("Backcasting %s response had no ranked items, ranking its tasks directly", horizon_label)
+                items = self._items_from_actions(actions)
+            prioritization_data[horizon_key] = items
+            token_usage += horizon_tokens
+            if horizon_response:
+                responses.append(horizon_response)
         
-        return f"""Original Problem Statement: {strategic_question}
+        return self._finalize(prioritization_data, "\n\n".join(responses), token_usage)
 
-High-Impact Initiatives Agent provided the following immediate action items:
-{near_term_text}
-{medium_term_text}
-{long_term_text}
+    def _horizon_prompt(self, strategic_question: str, horizon_key: str, horizon_label: str, actions: List[ActionItem]) -> str:
+        """Prompt asking to rank the actions of a single time horizon"""
+        buf = io.StringIO()
+        buf.write(f"Original Problem Statement: {strategic_question}\n\n"
+                  f"High-Impact Initiatives Agent provided the following {horizon_label} immediate action items:\n")
+        self._write_actions(buf, actions, horizon_label)
+        buf.write(f"""
 
 INSTRUCTIONS: 
-1. Prioritize EACH immediate action item within its time horizon using the 3 criteria (Urgency, Impact, Feasibility)
-2. Output in the exact JSON format specified in your system prompt
-3. Rank from 1 (highest priority) to N (lowest priority) within each time horizon
-4. Provide specific justifications based on the 3 criteria for each ranking
+1. Prioritize EACH of these action items using the 3 criteria (Urgency, Impact, Feasibility)
+2. Output JSON in the format specified in your system prompt, containing ONLY the "{horizon_key}" list
+3. Rank from 1 (highest priority) to N (lowest priority)
+4. Provide specific justifications based on the 3 criteria for each ranking""")
+        return buf.getvalue()
 
-Focus on creating an actionable priority sequence that decision-makers can execute immediately."""
+    async def _rank_horizon(self, input_data: Dict[str, Any], horizon_key: str, horizon_label: str, actions: List[ActionItem]) -> Tuple[List[Dict[str, Any]], int, str]:
+        """Rank the actions of a single time horizon with its own LLM call.
 
-    async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            # DETAILED DIAGNOSTIC LOGGING
-            print("\n" + "="*80)
-            print("BACKCASTING AGENT - DETAILED DIAGNOSTICS")
-            print("="*80)
-            print(f"Input keys: {list(input_data.keys())}")
-            
-            # Check if high_impact exists
-            if 'high_impact' in input_data:
-                print("✓ high_impact key found in input_data")
-                high_impact_result = input_data.get('high_impact', {})
-                print(f"  high_impact type: {type(high_impact_result)}")
-                print(f"  high_impact keys: {list(high_impact_result.keys()) if isinstance(high_impact_result, dict) else 'N/A'}")
-                
-                if isinstance(high_impact_result, dict) and 'data' in high_impact_result:
-                    print("✓ data key found in high_impact")
-                    data = high_impact_result['data']
-                    print(f"  data keys: {list(data.keys()) if isinstance(data, dict) else 'N/A'}")
-                    
-                    if isinstance(data, dict) and 'execution_ready_initiatives' in data:
-                        print("✓ execution_ready_initiatives found in data")
-                        initiatives = data['execution_ready_initiatives']
-                        print(f"  Number of initiatives: {len(initiatives) if isinstance(initiatives, list) else 'N/A'}")
-                        if isinstance(initiatives, list):
-                            for i, init in enumerate(initiatives):
-                                print(f"  Initiative {i+1}:")
-                                print(f"    Title: {init.get('title', 'N/A')}")
-                                print(f"    Time Horizon: {init.get('time_horizon', 'N/A')}")
-                                print(f"    Immediate Tasks: {len(init.get('immediate_tasks', []))}")
-                    else:
-                        print("✗ execution_ready_initiatives NOT found in data")
-                else:
-                    print("✗ data key NOT found in high_impact")
-            else:
-                print("✗ high_impact key NOT found in input_data")
-                print(f"Available keys: {list(input_data.keys())}")
-            print("="*80 + "\n")
-            
-            prompt = self.format_prompt(input_data)
-            print(f"\n📝 Backcasting Prompt Length: {len(prompt)} characters")
-            print(f"📝 Prompt Preview (first 500 chars):\n{prompt[:500]}...")
-            
-            response, token_usage = await self.invoke_llm(prompt)
-            print(f"\n📥 LLM Response Length: {len(response)} characters")
-            print(f"📥 Response Preview (first 1000 chars):\n{response[:1000]}...")
-            
-            # Parse JSON from response
-            prioritization_data = self._parse_prioritization_json(response)
-            print(f"\n🔍 JSON Parsing Result: {prioritization_data is not None}")
-            
-            # If JSON parsing fails, try to parse structured text
-            if not prioritization_data:
-                print("⚠️ JSON parsing failed, trying text parsing...")
-                prioritization_data = self._parse_prioritization_text(response)
-                print(f"🔍 Text Parsing Result: {prioritization_data is not None}")
-            
-            # If still no data, create fallback structure
-            if not prioritization_data:
-                print("⚠️ All parsing failed, creating fallback...")
-                prioritization_data = self._create_fallback_prioritization()
-            
-            # Log what we're about to return
-            print("\n📊 FINAL PRIORITIZATION DATA (before validation):")
-            for key in ['near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization']:
+        Returns (items, token_usage, raw_response). Horizons without actions
+        are skipped without calling the LLM.
+        """
+        if not actions:
+            return [], 0, ""
+        
+        strategic_question = input_data.get('strategic_question', 'N/A')
+        
+        prompt = self._horizon_prompt(strategic_question, horizon_key, horizon_label, actions)
+        
+        response, token_usage = await self.invoke_llm(prompt, response_schema=_HORIZON_SCHEMAS[horizon_key], question=strategic_question)
+        
+        parsed = self._parse_prioritization_json(response, (horizon_key,)) or {}
+        items = parsed.get(horizon_key) or []
+        logger.debug("🔍 %s: ranked %d of %d actions", horizon_label, len(items), len(actions))
+        return items, token_usage, response
+
+    def _empty_result(self) -> Dict[str, Any]:
+        """Result for input without any immediate tasks, built without calling the LLM"""
+        logger.warning("⚠️ No immediate tasks from High Impact, returning generic fallback without calling the LLM")
+        return self.format_output(self._create_fallback_prioritization() | {"token_usage": 0}, "")
+
+    def _finalize(self, prioritization_data: Dict[str, Any], response: str, token_usage: int) -> Dict[str, Any]:
+        """Apply the task-based fallback if nothing was ranked and format the output"""
+        # Log what we're about to return
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 FINAL PRIORITIZATION DATA (before validation):")
+            for key in _HORIZON_KEYS:
                 items = prioritization_data.get(key, [])
-                print(f"  {key}: {len(items)} items")
+                logger.debug("  %s: %d items", key, len(items))
                 if items and len(items) > 0:
-                    print(f"    First item: {items[0].get('title', 'NO TITLE')[:80]}...")
-            
-            # CRITICAL FIX: If ALL lists are empty, something went wrong - use a robust fallback
-            total_items = sum(len(prioritization_data.get(key, [])) for key in ['near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization'])
-            
-            if total_items == 0:
-                print("\n⚠️ WARNING: All prioritization lists are empty! Using enhanced fallback...")
-                
-                # Check if we had any action items stored from format_prompt
-                total_actions = len(getattr(self, 'near_term_actions', [])) + len(getattr(self, 'medium_term_actions', [])) + len(getattr(self, 'long_term_actions', []))
-                print(f"  Total actions available from High Impact: {total_actions}")
-                
-                if total_actions > 0:
-                    # We had data but LLM/parsing failed - create prioritization from actual tasks
-                    prioritization_data = self._create_prioritization_from_tasks(
-                        self.near_term_actions, 
-                        self.medium_term_actions, 
-                        self.long_term_actions
-                    )
-                    print(f"  ✅ Created prioritization from {total_actions} actual tasks")
-                else:
-                    # No tasks available at all - use generic fallback
-                    prioritization_data = self._create_fallback_prioritization()
-                    print(f"  ✅ Using generic fallback (no tasks available)")
-            
-            prioritization_data["token_usage"] = token_usage
-            formatted_result = self.format_output(prioritization_data, response)
-            
-            print(f"\n✅ Returning formatted result with status: {formatted_result.get('status', 'unknown')}")
-            print(f"📄 Formatted output length: {len(formatted_result.get('data', {}).get('formatted_output', ''))} characters")
+                    logger.debug("    First item: %.80s...", items[0].get('title', 'NO TITLE'))
+        
+        # CRITICAL FIX: If ALL lists are empty, something went wrong - use a robust fallback
+        has_items = any(prioritization_data.get(key) for key in _HORIZON_KEYS)
+        
+        if not has_items:
+            logger.warning("⚠️ All prioritization lists are empty! Using enhanced fallback...")
             
-            return formatted_result
+            # Check if we had any action items stored by _extract_actions
+            total_actions = sum(map(len, self._horizon_actions()))
+            logger.debug("  Total actions available from High Impact: %d", total_actions)
             
-        except Exception as e:
-            logger.error(f"Error in BackcastingAgent: {str(e)}")
-            return {
-                "status": "error",
-                "error": str(e),
-                "agent_type": self.__class__.__name__
-            }
+            if total_actions > 0:
+                # We had data but LLM/parsing failed - create prioritization from actual tasks
+                prioritization_data = self._create_prioritization_from_tasks(
+                    self.near_term_actions, 
+                    self.medium_term_actions, 
+                    self.long_term_actions
+                )
+                logger.debug("  ✅ Created prioritization from %d actual tasks", total_actions)
+            else:
+                # No tasks available at all - use generic fallback
+                prioritization_data = self._create_fallback_prioritization()
+                logger.debug("  ✅ Using generic fallback (no tasks available)")
+        
+        prioritization_data["token_usage"] = token_usage
+        formatted_result = self.format_output(prioritization_data, response)
+        
+        logger.debug("✅ Returning formatted result with status: %s", formatted_result.get('status', 'unknown'))
+        logger.debug("📄 Formatted output length: %d characters", len(formatted_result.get('data', {}).get('formatted_output', '')))
+        
+        return formatted_result
+
+    def _horizon_actions(self) -> List[List[ActionItem]]:
+        return [self.near_term_actions, self.medium_term_actions, self.long_term_actions]
 
-    def _parse_prioritization_json(self, response: str) -> Dict[str, Any]:
+    def _parse_prioritization_json(self, response: str, required_keys: Tuple[str, ...] = _HORIZON_KEYS) -> Dict[str, Any]:
         """Parse JSON-formatted prioritization from LLM response"""
         try:
-            # Look for JSON blocks in the response
-            json_pattern = r'```json\s*(\{.*?\})\s*```'
-            json_matches = re.findall(json_pattern, response, re.DOTALL)
+            data = _decode_first_json_object(response)
             
-            print(f"🔎 Looking for JSON in response... Found {len(json_matches)} JSON blocks")
+            logger.debug("🔎 Looking for JSON in response... Found JSON object: %s", data is not None)
             
-            if json_matches:
-                json_str = json_matches[0]
-                print(f"🔎 JSON block preview (first 200 chars): {json_str[:200]}...")
-                data = json.loads(json_str)
-                
+            if isinstance(data, dict):
                 # Validate structure
-                required_keys = ['near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization']
-                if all(key in data for key in required_keys):
-                    print(f"✅ Valid JSON structure with all required keys")
-                    return data
-                else:
-                    print(f"⚠️ JSON found but missing required keys. Has: {list(data.keys())}")
-            
-            # Try parsing entire response as JSON
-            if response.strip().startswith('{'):
-                print("🔎 Trying to parse entire response as JSON...")
-                data = json.loads(response.strip())
-                required_keys = ['near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization']
                 if all(key in data for key in required_keys):
-                    print(f"✅ Valid JSON structure from full response")
-                    return data
-                else:
-                    print(f"⚠️ Full response JSON missing required keys. Has: {list(data.keys())}")
+                    logger.debug("✅ Valid JSON structure with all required keys")
+                    return _normalize_prioritization(data)
+                logger.debug("⚠️ JSON found but missing required keys. Has: %s", list(data.keys()))
                 
         except json.JSONDecodeError as e:
-            print(f"❌ JSON decode error: {str(e)}")
+            logger.warning("❌ JSON decode error: %s", e)
         except Exception as e:
-            print(f"❌ Error parsing JSON: {str(e)}")
+            logger.warning("❌ Error parsing JSON: %s", e)
         
         return None
 
-    def _parse_prioritization_text(self, response: str) -> Dict[str, Any]:
-        """Fallback method to parse structured text if JSON parsing fails"""
-        print("🔄 Attempting text parsing fallback...")
-        prioritization = {
-            'near_term_prioritization': [],
-            'medium_term_prioritization': [],
-            'long_term_prioritization': []
-        }
-        
-        lines = response.split('\n')
-        current_section = None
-        current_item = {}
-        items_found = 0
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Check for time horizon sections
-            if 'near_term' in line.lower() or 'near-term' in line.lower():
-                current_section = 'near_term_prioritization'
-                continue
-            elif 'medium_term' in line.lower() or 'medium-term' in line.lower():
-                current_section = 'medium_term_prioritization'
-                continue
-            elif 'long_term' in line.lower() or 'long-term' in line.lower():
-                current_section = 'long_term_prioritization'
-                continue
-            
-            # Parse numbered items
-            if current_section and re.match(r'^\d+\.', line):
-                # Save previous item
-                if current_item and 'title' in current_item:
-                    prioritization[current_section].append(current_item)
-                    items_found += 1
-                
-                # Start new item
-                rank_match = re.match(r'^(\d+)\.\s*(.+)', line)
-                if rank_match:
-                    current_item = {
-                        'rank': int(rank_match.group(1)),
-                        'title': rank_match.group(2),
-                        'justification': ''
-                    }
-            
-            # Parse justification
-            elif current_item and ('justification' in line.lower() or 'reason' in line.lower()):
-                justification_text = line.split(':', 1)[1].strip() if ':' in line else line
-                current_item['justification'] = justification_text
-            
-            # Continue previous justification
-            elif current_item and current_item.get('justification') and not re.match(r'^\d+\.', line):
-                current_item['justification'] += ' ' + line
-        
-        # Save last item
-        if current_item and 'title' in current_item and current_section:
-            prioritization[current_section].append(current_item)
-            items_found += 1
-        
-        print(f"✅ Text parsing complete. Found {items_found} total items")
-        for key in ['near_term_prioritization', 'medium_term_prioritization', 'long_term_prioritization']:
-            print(f"  {key}: {len(prioritization[key])} items")
-        
-        return prioritization
+    @staticmethod
+    def _items_from_actions(actions: List[ActionItem]) -> List[Dict[str, Any]]:
+        """Convert action items to prioritized items, in their original order"""
+        items = []
+        # Tasks of the same initiative share one justification, so build each only once
+        justifications = {}
+        for i, action in enumerate(actions, 1):
+            key = (action.initiative, action.why_important)
+            justification = justifications.get(key)
+            if justification is None:
+                why_important = action.why_important
+                if len(why_important) > 200:
+                    why_important = why_important[:200]
+                justification = f"This task is part of the {action.initiative} initiative. {why_important}{_FALLBACK_JUSTIFICATION_SUFFIX}"
+                justifications[key] = justification
+            items.append({
+                'rank': i,
+                'title': action.task,
+                'justification': justification
+            })
+        return items
 
-    def _create_prioritization_from_tasks(self, near_term_actions: List[Dict], medium_term_actions: List[Dict], long_term_actions: List[Dict]) -> Dict[str, Any]:
+    def _create_prioritization_from_tasks(self, near_term_actions: List[ActionItem], medium_term_actions: List[ActionItem], long_term_actions: List[ActionItem]) -> Dict[str, Any]:
         """Create prioritization directly from task data when LLM/parsing fails"""
-        
-        def create_items_from_actions(actions):
-            """Convert action items to prioritized items"""
-            items = []
-            for i, action in enumerate(actions, 1):
-                items.append({
-                    'rank': i,
-                    'title': action['task'],
-                    'justification': f"This task is part of the {action['initiative']} initiative. {action['context']['why_important'][:200]}... Given its strategic importance and operational feasibility, this task has been prioritized to ensure effective implementation."
-                })
-            return items
-        
         return {
-            'near_term_prioritization': create_items_from_actions(near_term_actions),
-            'medium_term_prioritization': create_items_from_actions(medium_term_actions),
-            'long_term_prioritization': create_items_from_actions(long_term_actions)
+            'near_term_prioritization': self._items_from_actions(near_term_actions),
+            'medium_term_prioritization': self._items_from_actions(medium_term_actions),
+            'long_term_prioritization': self._items_from_actions(long_term_actions)
         }
     
     def _create_fallback_prioritization(self) -> Dict[str, Any]:
         """Create fallback prioritization structure when no task data is available"""
-        return {
-            'near_term_prioritization': [
-                {
-                    'rank': 1,
-                    'title': 'Define strategic implementation framework',
-                    'justification': 'High urgency to establish foundation for all strategic initiatives. High impact as it enables subsequent actions. Highly feasible with current resources and organizational capabilities.'
-                }
-            ],
-            'medium_term_prioritization': [
-                {
-                    'rank': 1,
-                    'title': 'Execute strategic initiatives based on near-term foundations',
-                    'justification': 'Medium urgency following near-term setup phase. High impact on achieving strategic goals. Feasible with capabilities developed in near-term phase.'
-                }
-            ],
-            'long_term_prioritization': [
-                {
-                    'rank': 1,
-                    'title': 'Sustain and scale strategic outcomes',
-                    'justification': 'Lower immediate urgency but essential for long-term sustainability. Very high long-term impact on organizational success. Feasible with systems and processes established in earlier phases.'
-                }
-            ]
-        }
+        # Fresh containers so callers can add token_usage or edit items freely
+        return {key: [dict(item) for item in items] for key, items in _FALLBACK_PRIORITIZATION.items()}
 
-    def format_output(self, prioritization_data: Dict[str, Any], response: str) -> Dict[str, Any]:
-        """Format the output in a structured way."""
+    def format_output(self, prioritization_data: Dict[str, Any], response: str, keep_raw: Optional[bool] = None) -> Dict[str, Any]:
+        """Format the output in a structured way.
+
+        The raw LLM response is only included when keep_raw is set (or the
+        STRATEGIC_KEEP_RAW_LLM=1 env var is); otherwise a short digest and its
+        length are returned so the multi-KB string does not travel through the
+        orchestrator and into the database.
+        """
         # Create a human-readable markdown format
-        markdown_output = "\n\n"
+        parts = ["\n\n"]
         token_usage = prioritization_data.pop("token_usage", 0)
         
-        time_horizons = {
-            'near_term_prioritization': 'Near-Term (0–2 years)',
-            'medium_term_prioritization': 'Medium-Term (2–5 years)',
-            'long_term_prioritization': 'Long-Term (5–10 years)'
-        }
-        
-        for section_key, section_title in time_horizons.items():
+        for section_key, section_title in _OUTPUT_SECTIONS:
             items = prioritization_data.get(section_key, [])
             if items:
-                markdown_output += f"# {section_title}\n\n"
-                for item in sorted(items, key=lambda x: x.get('rank', 999)):
-                    rank = item.get('rank', 'N/A')
-                    title = item.get('title', 'Untitled Action')
-                    justification = item.get('justification', 'No justification provided')
-                    
-                    markdown_output += f"### {rank}. {title}\n\n"
-                    markdown_output += f"**Justification:** {justification}\n\n"
-                    markdown_output += "---\n\n"
+                parts.append(f"# {section_title}\n\n")
+                # Items are sorted and complete once parsed, see _normalize_prioritization
+                parts.extend(
+                    f"### {rank}. {title}\n\n**Justification:** {justification}\n\n---\n\n"
+                    for rank, title, justification in map(_rank_title_justification, items)
+                )
             else:
-                markdown_output += f"# {section_title}\n\nNo action items identified for this time horizon.\n\n"
+                parts.append(f"# {section_title}\n\nNo action items identified for this time horizon.\n\n")
+        
+        data = {
+            "prioritized_actions": prioritization_data,
+            "formatted_output": "".join(parts)
+        }
+        if keep_raw is None:
+            keep_raw = os.getenv("STRATEGIC_KEEP_RAW_LLM", "0") == "1"
+        if keep_raw:
+            data["raw_llm_response"] = response
+        else:
+            data["raw_llm_response_sha"] = hashlib.blake2b(response.encode('utf-8'), digest_size=8).hexdigest()
+            data["raw_llm_response_len"] = len(response)
+        data["token_usage"] = token_usage
         
         return {
             "status": "success",
-            "data": {
-                "prioritized_actions": prioritization_data,
-                "formatted_output": markdown_output,
-                "raw_llm_response": response,
-                "token_usage": token_usage
-            }
+            "data": data
         }
\ No newline at end of file
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, Callable, Optional, Tuple, AsyncIterator
 from langchain_core.messages import HumanMessage, SystemMessage
 import asyncio
 from app.core.llm import get_llm
@@ -8,7 +8,19 @@ import logging
 import sys
 from fastapi import HTTPException
 import time
-import random
+from random import random as _rand
+import os
+import re
+from ._cache import TTLCache, make_cache_key, normalized_words
+
+try:
+    import orjson
+
+    def _dumps_indented(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    def _dumps_indented(obj: Any) -> str:
+        return json.dumps(obj, indent=2)
 
 # Configure basic logging to stdout only
 logging.basicConfig(
@@ -25,13 +37,53 @@ logging.getLogger('httpx').setLevel(logging.WARNING)
 logging.getLogger('httpcore').setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
+# Response cache shared by all agents and both invoke_llm and invoke_llm_stream,
+# enabled with AGENT_PROMPT_CACHE=1. Besides the exact prompt it serves a prompt
+# whose strategic question is worded differently only in case, punctuation or
+# articles; the rest of the prompt (region, time frame, context, ...) must match.
+_PROMPT_CACHE = TTLCache(maxsize=1024, ttl=3600)
+
+_LOG_RULE = '=' * 80
+
+# Error messages that indicate a rate limit (429) from the LLM provider
+_RATE_LIMIT_RE = re.compile(
+    r'429|rate\s*limit|quota\s*exceeded|service\s*tier\s*capacity\s*exceeded|too\s*many\s*requests',
+    re.IGNORECASE
+)
+
+# validate_input tables: fields that must be strings when present, and
+# (field, allowed values, allowed values in message order) for the customization options
+_STRING_FIELDS = ('strategic_question', 'time_frame', 'region', 'additional_context')
+_ANALYSIS_DEPTHS = ('standard', 'detailed', 'comprehensive')
+_CREATIVITY_LEVELS = ('balanced', 'creative', 'highly_creative')
+_FOCUS_AREAS = ('general', 'technology', 'market', 'regulatory', 'social')
+_FIELD_CHOICES = tuple(
+    (field, frozenset(choices), ", ".join(choices))
+    for field, choices in (
+        ('analysis_depth', _ANALYSIS_DEPTHS),
+        ('creativity_level', _CREATIVITY_LEVELS),
+        ('focus_areas', _FOCUS_AREAS),
+    )
+)
+
 class BaseAgent(ABC):
+    # Subclasses declare __slots__ too (empty unless they add attributes) so agent
+    # instances carry no per-instance __dict__
+    __slots__ = (
+        'llm', 'max_retries', 'timeout', 'total_budget', 'base_retry_delay',
+        'system_prompt', 'required_fields', 'optional_fields'
+    )
+
+    # System prompts are static per agent class; build each once and share it
+    _SYSTEM_PROMPT_CACHE: Dict[type, str] = {}
+
     def __init__(self):
-        self.llm = get_llm()
+        self.llm = get_llm()  # process-wide shared client; don't mutate it per agent
         self.max_retries = 3  # Reduced retries for deployment
         self.timeout = 90  # Reduced timeout for deployment constraints
+        self.total_budget = 120  # Overall deadline for one LLM call, retries included (capped by the orchestrator)
         self.base_retry_delay = 1  # Faster retry for deployment
-        self.system_prompt = self.get_system_prompt()
+        self.system_prompt = self._cached_system_prompt()
         self.required_fields = ['strategic_question', 'time_frame', 'region']
         self.optional_fields = ['additional_context', 'analysis_depth', 'creativity_level', 'focus_areas']
 
@@ -43,6 +95,13 @@ class BaseAgent(ABC):
         """
         raise NotImplementedError("Each agent must implement get_system_prompt")
 
+    def _cached_system_prompt(self) -> str:
+        agent_class = type(self)
+        system_prompt = BaseAgent._SYSTEM_PROMPT_CACHE.get(agent_class)
+        if system_prompt is None:
+            system_prompt = BaseAgent._SYSTEM_PROMPT_CACHE[agent_class] = self.get_system_prompt()
+        return system_prompt
+
     @abstractmethod
     def format_prompt(self, input_data: Dict[str, Any]) -> str:
         """
@@ -61,44 +120,22 @@ class BaseAgent(ABC):
                 detail=f"Missing required fields: {', '.join(missing_fields)}"
             )
 
-        # Validate field types
-        if not isinstance(input_data['strategic_question'], str):
-            raise HTTPException(
-                status_code=400,
-                detail="strategic_question must be a string"
-            )
-        if not isinstance(input_data['time_frame'], str):
-            raise HTTPException(
-                status_code=400,
-                detail="time_frame must be a string"
-            )
-        if not isinstance(input_data['region'], str):
-            raise HTTPException(
-                status_code=400,
-                detail="region must be a string"
-            )
-        if 'additional_context' in input_data and not isinstance(input_data['additional_context'], str):
-            raise HTTPException(
-                status_code=400,
-                detail="additional_context must be a string"
-            )
+        # Validate field types (required fields are known to be present at this point)
+        for field in _STRING_FIELDS:
+            if field in input_data and not isinstance(input_data[field], str):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{field} must be a string"
+                )
         
-        # Validate optional customization fields
-        if 'analysis_depth' in input_data and input_data['analysis_depth'] not in ['standard', 'detailed', 'comprehensive']:
-            raise HTTPException(
-                status_code=400,
-                detail="analysis_depth must be one of: standard, detailed, comprehensive"
-            )
-        if 'creativity_level' in input_data and input_data['creativity_level'] not in ['balanced', 'creative', 'highly_creative']:
-            raise HTTPException(
-                status_code=400,
-                detail="creativity_level must be one of: balanced, creative, highly_creative"
-            )
-        if 'focus_areas' in input_data and input_data['focus_areas'] not in ['general', 'technology', 'market', 'regulatory', 'social']:
-            raise HTTPException(
-                status_code=400,
-                detail="focus_areas must be one of: general, technology, market, regulatory, social"
-            )
+        # Validate optional customization fields (all options are strings; the isinstance
+        # check also keeps unhashable values out of the frozenset lookup)
+        for field, allowed, allowed_text in _FIELD_CHOICES:
+            if field in input_data and not (isinstance(input_data[field], str) and input_data[field] in allowed):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"{field} must be one of: {allowed_text}"
+                )
 
     def get_customization_instructions(self, input_data: Dict[str, Any]) -> str:
         """Generate customization instructions based on user preferences"""
@@ -150,18 +187,85 @@ class BaseAgent(ABC):
 
     def is_rate_limit_error(self, error: Exception) -> bool:
         """Check if the error is a rate limit (429) error"""
-        error_str = str(error).lower()
-        return (
-            "429" in error_str or 
-            "rate limit" in error_str or 
-            "quota exceeded" in error_str or
-            "service tier capacity exceeded" in error_str or
-            "too many requests" in error_str
-        )
-
-    async def invoke_llm(self, prompt: str) -> (str, int):
-        """Invoke the LLM and return the response content and token usage."""
+        return _RATE_LIMIT_RE.search(str(error)) is not None
+
+    def _structured_output_kwargs(self, response_schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """LLM call kwargs constraining Gemini to JSON matching response_schema"""
+        if response_schema is None:
+            return {}
+        return {
+            "generation_config": {
+                "response_mime_type": "application/json",
+                "response_schema": response_schema
+            }
+        }
+
+    def _prompt_cache_keys(self, prompt: str, response_schema: Optional[Dict[str, Any]],
+                           question: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        """Exact and near-duplicate cache keys for a system/user prompt pair.
+
+        The near-duplicate key masks the question's text in the prompt and adds
+        its normalized words instead, so only the question's wording may vary.
+        It is None when no question is given or it does not occur in prompt.
+        """
+        model_id = getattr(self.llm, 'model', None)
+        cache_key = make_cache_key([model_id, response_schema, self.system_prompt + "\x1f" + prompt])
+        if not question or question not in prompt:
+            return cache_key, None
+        near_key = make_cache_key([
+            model_id, response_schema, self.system_prompt,
+            prompt.replace(question, "\x00"), normalized_words(question)
+        ])
+        return cache_key, near_key
+
+    def _lookup_prompt_cache(self, cache_key: str, near_key: Optional[str]) -> Optional[str]:
+        cached = _PROMPT_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info(f"{self.__class__.__name__}: prompt cache hit")
+            return cached
+        if near_key is None:
+            return None
+        cached = _PROMPT_CACHE.get(near_key)
+        if cached is not None:
+            logger.info(f"{self.__class__.__name__}: near-duplicate question cache hit")
+        return cached
+
+    @staticmethod
+    def _store_prompt_cache(cache_key: str, near_key: Optional[str], content: str) -> None:
+        _PROMPT_CACHE.put(cache_key, content)
+        if near_key is not None:
+            _PROMPT_CACHE.put(near_key, content)
+
+    @staticmethod
+    def _bounded_delay(delay: float, deadline: float) -> float:
+        """Clamp a retry delay so the sleep never runs past the call's deadline"""
+        return min(delay, max(0.0, deadline - time.monotonic()))
+
+    async def invoke_llm(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None,
+                         question: Optional[str] = None) -> (str, int):
+        """Invoke the LLM and return the response content and token usage.
+
+        If response_schema is given, the model is constrained to return JSON
+        matching that (Gemini OpenAPI-subset) schema. question is the strategic
+        question as it appears in prompt, for the near-duplicate cache key.
+        Attempts and retry delays share a single deadline of self.total_budget
+        seconds; each attempt gets at most self.timeout of what is left.
+        """
+        deadline = time.monotonic() + self.total_budget
+        # Exponential backoff per attempt; built here because subclasses may change
+        # max_retries / base_retry_delay after BaseAgent.__init__
+        backoffs = [self.base_retry_delay * (1 << attempt) for attempt in range(self.max_retries)]
+        llm_kwargs = self._structured_output_kwargs(response_schema)
+        cache_enabled = os.getenv("AGENT_PROMPT_CACHE") == "1"
+        if cache_enabled:
+            cache_key, near_key = self._prompt_cache_keys(prompt, response_schema, question)
+            cached = self._lookup_prompt_cache(cache_key, near_key)
+            if cached is not None:
+                return cached, 0
         for attempt in range(self.max_retries):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("Agent timed out. Please try again with a more focused prompt.")
             try:
                 messages = [
                     SystemMessage(content=self.system_prompt),
@@ -169,8 +273,8 @@ class BaseAgent(ABC):
                 ]
                 
                 response = await asyncio.wait_for(
-                    self.llm.ainvoke(messages),
-                    timeout=self.timeout
+                    self.llm.ainvoke(messages, **llm_kwargs),
+                    timeout=max(1.0, min(self.timeout, remaining))
                 )
                 
                 # Extract token usage from the response metadata
@@ -178,21 +282,23 @@ class BaseAgent(ABC):
                 if response.usage_metadata and 'total_tokens' in response.usage_metadata:
                     token_usage = response.usage_metadata['total_tokens']
                 
+                if cache_enabled:
+                    self._store_prompt_cache(cache_key, near_key, response.content)
                 return response.content, token_usage
                 
             except asyncio.TimeoutError:
                 if attempt < self.max_retries - 1:
-                    delay = self.base_retry_delay * (2 ** attempt) + random.uniform(0, 1)
+                    delay = self._bounded_delay(backoffs[attempt] + _rand(), deadline)
                     logger.warning(f"Timeout on attempt {attempt + 1}, retrying in {delay:.2f} seconds...")
                     await asyncio.sleep(delay)
                     continue
-                raise TimeoutError(f"Agent timed out. Please try again with a more focused prompt.")
+                raise TimeoutError("Agent timed out. Please try again with a more focused prompt.")
             
             except Exception as e:
                 if self.is_rate_limit_error(e):
                     if attempt < self.max_retries - 1:
                         # Exponential backoff with jitter for rate limit errors
-                        delay = self.base_retry_delay * (2 ** attempt) + random.uniform(0, 2)
+                        delay = self._bounded_delay(backoffs[attempt] + _rand() * 2.0, deadline)
                         logger.warning(f"Rate limit hit on attempt {attempt + 1}, retrying in {delay:.2f} seconds...")
                         await asyncio.sleep(delay)
                         continue
@@ -202,12 +308,94 @@ class BaseAgent(ABC):
                     )
                 else:
                     if attempt < self.max_retries - 1:
-                        delay = self.base_retry_delay + random.uniform(0, 1)
+                        delay = self._bounded_delay(self.base_retry_delay + _rand(), deadline)
                         logger.warning(f"Error on attempt {attempt + 1}: {str(e)}, retrying in {delay:.2f} seconds...")
                         await asyncio.sleep(delay)
                         continue
                     raise e
 
+    async def invoke_llm_stream(self, prompt: str, response_schema: Optional[Dict[str, Any]] = None,
+                                question: Optional[str] = None) -> AsyncIterator[Tuple[str, int]]:
+        """Stream the LLM response, yielding (text_chunk, token_usage) pairs.
+
+        Token usage is reported per chunk and should be summed by the caller.
+        There are no retries here: once chunks have been handed out a retry would
+        duplicate output. stream_llm adds timeouts, retries and the invoke_llm
+        fallback on top of this.
+        A cached response is yielded as a single chunk with no token usage, and
+        a completed stream is cached like an invoke_llm response.
+        """
+        cache_enabled = os.getenv("AGENT_PROMPT_CACHE") == "1"
+        if cache_enabled:
+            cache_key, near_key = self._prompt_cache_keys(prompt, response_schema, question)
+            cached = self._lookup_prompt_cache(cache_key, near_key)
+            if cached is not None:
+                yield cached, 0
+                return
+        messages = [
+            SystemMessage(content=self.system_prompt),
+            HumanMessage(content=prompt)
+        ]
+        chunks = []
+        async for chunk in self.llm.astream(messages, **self._structured_output_kwargs(response_schema)):
+            token_usage = 0
+            if chunk.usage_metadata and 'total_tokens' in chunk.usage_metadata:
+                token_usage = chunk.usage_metadata['total_tokens']
+            if chunk.content or token_usage:
+                chunks.append(chunk.content)
+                yield chunk.content, token_usage
+        if cache_enabled:
+            self._store_prompt_cache(cache_key, near_key, "".join(chunks))
+
+    async def stream_llm(self, prompt: str, on_text: Callable[[str], None],
+                         response_schema: Optional[Dict[str, Any]] = None,
+                         question: Optional[str] = None) -> Tuple[str, int, bool]:
+        """Stream the LLM response into on_text and return (response, token_usage, streamed).
+
+        Every chunk, the first one included, has to arrive within self.timeout,
+        and the whole call shares a deadline of self.total_budget seconds. Before
+        the first chunk a timeout is retried with backoff, up to self.max_retries
+        attempts; any other error then means the model cannot stream, and the
+        blocking invoke_llm is used instead (streamed is False and on_text has
+        not been called). After the first chunk errors are raised, since a retry
+        would throw the partial generation away and bill it again.
+        """
+        deadline = time.monotonic() + self.total_budget
+        for attempt in range(self.max_retries):
+            chunks = []
+            token_usage = 0
+            stream = self.invoke_llm_stream(prompt, response_schema, question)
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    try:
+                        text, chunk_tokens = await asyncio.wait_for(anext(stream), timeout=min(self.timeout, remaining))
+                    except StopAsyncIteration:
+                        return "".join(chunks), token_usage, True
+                    chunks.append(text)
+                    token_usage += chunk_tokens
+                    on_text(text)
+            except asyncio.TimeoutError:
+                if chunks:
+                    raise TimeoutError("Agent timed out while streaming. Please try again with a more focused prompt.")
+                if attempt < self.max_retries - 1:
+                    delay = self._bounded_delay(self.base_retry_delay * (1 << attempt) + _rand(), deadline)
+                    logger.warning("%s: no response within %ss on attempt %d, retrying in %.2f seconds...",
+                                   self.__class__.__name__, self.timeout, attempt + 1, delay)
+                    await asyncio.sleep(delay)
+                    continue
+                raise TimeoutError("Agent timed out. Please try again with a more focused prompt.")
+            except Exception as e:
+                if chunks:
+                    raise
+                logger.warning("Streaming unavailable for %s, falling back: %s", self.__class__.__name__, e)
+                response, token_usage = await self.invoke_llm(prompt, response_schema, question)
+                return response, token_usage, False
+            finally:
+                await stream.aclose()
+
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Process the input data and return the result"""
         try:
@@ -215,17 +403,17 @@ class BaseAgent(ABC):
             self.validate_input(input_data)
             
             agent_name = self.__class__.__name__
-            logger.info(f"\n{'='*80}\n{agent_name} Output:\n{'='*80}")
+            logger.info("\n%s\n%s Output:\n%s", _LOG_RULE, agent_name, _LOG_RULE)
             
             # Add customization instructions to the prompt
             customization_instructions = self.get_customization_instructions(input_data)
             if customization_instructions:
                 # Add customization instructions to the input data
                 input_data['customization_instructions'] = customization_instructions
-                logger.info(f"Customization instructions: {customization_instructions}")
+                logger.info("Customization instructions: %s", customization_instructions)
             
             prompt = self.format_prompt(input_data)
-            response_content, token_usage = await self.invoke_llm(prompt)
+            response_content, token_usage = await self.invoke_llm(prompt, question=input_data.get('strategic_question'))
             
             # Process the response and get output
             output_data = {
@@ -234,9 +422,11 @@ class BaseAgent(ABC):
             }
             output = self.format_output(output_data)
             
-            # Log the final output in a clean format
-            logger.info(f"\n{json.dumps(output['data'], indent=2)}\n")
-            logger.info(f"{'='*80}\n")
+            # Log the final output in a clean format; serializing it is the costly
+            # part, so skip it entirely when INFO is not being emitted
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("\n%s\n", _dumps_indented(output['data']))
+                logger.info("%s\n", _LOG_RULE)
             
             return output
             
@@ -1,12 +1,79 @@
-from typing import Dict, Any
+from typing import Dict, Any, Final, List, Optional, Tuple
+from pydantic import BaseModel, ValidationError
 from .base_agent import BaseAgent
+import asyncio
+import io
+import json
 import logging
+import string
+import sys
 
 logger = logging.getLogger(__name__)
 
-class BestPracticesAgent(BaseAgent):
-    def get_system_prompt(self) -> str:
-        return """You are the Best Practices Research Agent - an advanced analytical specialist trained to conduct rigorous, cross-domain investigations into proven solutions for challenges similar to the one presented.
+# Validation failures are fed back to the model this many times before giving up
+_MAX_SCHEMA_RETRIES = 2
+
+class Practice(BaseModel):
+    title: str
+    time_frame: str
+    organization: str
+    challenge: str
+    problem: str
+    solution: str
+    implementation_steps: List[str]
+    results: str
+    categorical_tags: List[str]
+    reference: str
+
+
+class NextPractice(BaseModel):
+    recommendation: str
+    key_implementation_steps: List[str]
+    success_metrics: List[str]
+
+
+class BestPracticesResponse(BaseModel):
+    practices: List[Practice]
+    next_practice: NextPractice
+
+
+def _string_array() -> Dict[str, Any]:
+    return {"type": "ARRAY", "items": {"type": "STRING"}}
+
+
+def _object_schema(properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+
+# Gemini response_schema (OpenAPI subset) mirroring BestPracticesResponse; Gemini
+# does not accept the $defs/$ref JSON Schema that pydantic generates
+_BEST_PRACTICES_SCHEMA = _object_schema({
+    "practices": {
+        "type": "ARRAY",
+        "items": _object_schema({
+            "title": {"type": "STRING"},
+            "time_frame": {"type": "STRING"},
+            "organization": {"type": "STRING"},
+            "challenge": {"type": "STRING"},
+            "problem": {"type": "STRING"},
+            "solution": {"type": "STRING"},
+            "implementation_steps": _string_array(),
+            "results": {"type": "STRING"},
+            "categorical_tags": _string_array(),
+            "reference": {"type": "STRING"}
+        })
+    },
+    "next_practice": _object_schema({
+        "recommendation": {"type": "STRING"},
+        "key_implementation_steps": _string_array(),
+        "success_metrics": _string_array()
+    })
+})
+
+# Static system prompt, sent as its own leading SystemMessage by invoke_llm.
+# Keep it free of dynamic content (timestamps, session ids, user input) so the
+# prefix stays byte-identical across calls and Gemini's implicit prefix cache can hit.
+_BEST_PRACTICES_SYSTEM_PROMPT: Final[str] = sys.intern("""You are the Best Practices Research Agent - an advanced analytical specialist trained to conduct rigorous, cross-domain investigations into proven solutions for challenges similar to the one presented.
 
 Your mission is to:
 
@@ -27,24 +94,11 @@ Only consult high-authority, verifiable sources, including:
 * Verified news sources & expert analysis
 * Documented success stories from reputable industry leaders
 
-Documentation Format for Each Best Practice (3–5 examples minimum)
-Present each best practice in a structured, evidence-based format:
-1. Best Practice Title – Concise, descriptive, and solution-focused
-2. Implementation Date – Specific date or timeframe when executed
-3. Implementing Organization – The entity or team behind the solution
-4. Challenge Context – The specific problem faced, emphasizing parallels to the user's situation
-5. Solution Overview – Core strategy or methodology used
-6. Implementation Details – Step-by-step actions, resources, technologies, and processes applied
-7. Measured Outcomes – Quantifiable and qualitative results (include metrics where available)
-8. Categorical Tags – 3–5 tags for classification and future reference
-9. Source References – Full citations for verification and credibility
-
-Output Style:
-* Use bullet points or tables for clarity.
-* Highlight critical success factors and pitfalls within each case.
+Documentation of Each Best Practice (exactly 3)
+Document each best practice with evidence, in the practices fields described below, emphasizing parallels to the user's situation. Include metrics in results where available, and name critical success factors and pitfalls in solution and results.
 
 Stage 2 – Synthesis & "Next Practice" Recommendation
-After documenting at least 3–5 best practices, synthesize your findings:
+After documenting the 3 best practices, synthesize your findings into next_practice:
 i. Pattern Recognition – Identify common success factors, recurring methodologies, and contextual dependencies.
 ii. Relevance Assessment – Evaluate which practices are most adaptable to the user's specific challenge, considering context, scale, and constraints.
 iii. Next Practice Design – Develop a tailored, forward-looking strategy that:
@@ -53,68 +107,126 @@ iii. Next Practice Design – Develop a tailored, forward-looking strategy that:
 * Accounts for implementation barriers (resource, cultural, or regulatory)
 
 CRITICAL OUTPUT FORMAT REQUIREMENTS
-You MUST format your response using exactly this structure:
-
-### Best Practice 1: [Title]
-**Time Frame:** [When was it implemented]
-**Organization:** [Who implemented it]
-**Challenge:** [A detailed, 4-5 sentence description of the challenge context]
-**Problem:** [A detailed, 4-5 sentence description of what they were trying to solve]
-**Solution:** [A detailed, 4-5 sentence description of their approach and methodology]
-**Implementation Steps:**
-1. [Step 1 details]
-2. [Step 2 details]
-3. [Step 3 details]
-**Results:** [A detailed, 4-5 sentence description of key outcomes and impacts]
-**Categorical Tags:** [Tag 1], [Tag 2], [Tag 3], [Tag 4], [Tag 5]
-**Reference:** [Full citation or URL]
-
-### Best Practice 2: [Title]
-**Time Frame:** [When was it implemented]
-**Organization:** [Who implemented it]
-**Challenge:** [A detailed, 4-5 sentence description of the challenge context]
-**Problem:** [A detailed, 4-5 sentence description of what they were trying to solve]
-**Solution:** [A detailed, 4-5 sentence description of their approach and methodology]
-**Implementation Steps:**
-1. [Step 1 details]
-2. [Step 2 details]
-3. [Step 3 details]
-**Results:** [A detailed, 4-5 sentence description of key outcomes and impacts]
-**Categorical Tags:** [Tag 1], [Tag 2], [Tag 3], [Tag 4], [Tag 5]
-**Reference:** [Full citation or URL]
-
-### Best Practice 3: [Title]
-**Time Frame:** [When was it implemented]
-**Organization:** [Who implemented it]
-**Challenge:** [A detailed, 4-5 sentence description of the challenge context]
-**Problem:** [A detailed, 4-5 sentence description of what they were trying to solve]
-**Solution:** [A detailed, 4-5 sentence description of their approach and methodology]
-**Implementation Steps:**
-1. [Step 1 details]
-2. [Step 2 details]
-3. [Step 3 details]
-**Results:** [A detailed, 4-5 sentence description of key outcomes and impacts]
-**Categorical Tags:** [Tag 1], [Tag 2], [Tag 3], [Tag 4], [Tag 5]
-**Reference:** [Full citation or URL]
-
-### Next Practice Recommendation
-[Combined recommendation integrating proven elements with innovative adaptations]
-
-### Key Implementation Steps
-1. [Comprehensive step 1 with rationale and execution details]
-2. [Comprehensive step 2 with rationale and execution details]
-3. [Comprehensive step 3 with rationale and execution details]
-
-### Success Metrics
-1. [Detailed metric 1 with measurement approach]
-2. [Detailed metric 2 with measurement approach]  
-3. [Detailed metric 3 with measurement approach]
-
-Output Guidelines
-* Present results in a clean, structured format with clear section headings.
+Respond with a single JSON object matching the response schema and nothing else (no markdown, headings, bullet lists or tables outside it):
+* practices – exactly 3 best practices, each with:
+  - title – a short name for the practice
+  - time_frame – when it was implemented
+  - organization – who implemented it
+  - challenge – a detailed, 4-5 sentence description of the challenge context
+  - problem – a detailed, 4-5 sentence description of what they were trying to solve
+  - solution – a detailed, 4-5 sentence description of their approach and methodology
+  - implementation_steps – the key implementation steps, one per item
+  - results – a detailed, 4-5 sentence description of key outcomes and impacts
+  - categorical_tags – 3-5 tags
+  - reference – full citation or URL
+* next_practice – with:
+  - recommendation – combined recommendation integrating proven elements with innovative adaptations
+  - key_implementation_steps – comprehensive steps with rationale and execution details
+  - success_metrics – detailed metrics with measurement approach
+
+Content Guidelines
 * Prioritize evidence, relevance, and actionability over length.
-* Explicitly state any assumptions and highlight information gaps that would strengthen future research.
-* Support all claims with credible sources (cite explicitly)."""
+* State any assumptions and information gaps inside the relevant fields.
+* Support all claims with credible sources, cited in reference.""")
+
+# The fixed request goes first so it extends the prefix shared by every call
+_PROMPT_TEMPLATE = string.Template("""Please provide 3 best practices and a next practice recommendation.
+
+Strategic Question: $strategic_question
+Time Frame: $time_frame
+Region/Scope: $region
+
+Problem Context:
+$problem_context""")
+
+def _unique_references(sources: List[Tuple[int, str]]) -> list:
+    """Reference dicts for (practice number, source) pairs, keeping the first
+    spelling and practice number of each distinct source"""
+    # The LLM often cites the same source for several practices; compare case-insensitively
+    unique_sources = {}
+    for practice_number, source in sources:
+        unique_sources.setdefault(source.lower(), (practice_number, source))
+    return [
+        {
+            "id": i,
+            "title": f"Best Practice {practice_number} Reference",
+            "source": source
+        }
+        for i, (practice_number, source) in enumerate(unique_sources.values(), 1)
+    ]
+
+
+def _lenient_fields(model: type, value: Any) -> Dict[str, Any]:
+    """Field values for a flat str / List[str] model from a JSON value that may be
+    partial: missing strings become "", lists are coerced to lists of strings"""
+    if not isinstance(value, dict):
+        value = {}
+    fields = {}
+    for name, field in model.model_fields.items():
+        item = value.get(name)
+        if field.annotation is str:
+            fields[name] = "" if item is None else str(item)
+        elif isinstance(item, list):
+            fields[name] = [str(entry) for entry in item if entry is not None]
+        else:
+            fields[name] = [] if item is None else [str(item)]
+    return fields
+
+
+def _parse_lenient(response: str) -> Optional[BestPracticesResponse]:
+    """Best-effort BestPracticesResponse from JSON that failed validation.
+
+    Returns None if response is not a JSON object at all.
+    """
+    text = response.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    practices = data.get("practices")
+    if not isinstance(practices, list):
+        practices = []
+    return BestPracticesResponse(
+        practices=[Practice(**_lenient_fields(Practice, practice)) for practice in practices if isinstance(practice, dict)],
+        next_practice=NextPractice(**_lenient_fields(NextPractice, data.get("next_practice")))
+    )
+
+
+def _write_numbered(buf: io.StringIO, items: List[str]) -> None:
+    for i, item in enumerate(items, 1):
+        buf.write(f"{i}. {item}\n")
+
+
+def _practice_body(practice: Practice) -> str:
+    """Markdown for a practice, from its title line on (the heading is the caller's)"""
+    buf = io.StringIO()
+    buf.write(
+        f"{practice.title}\n"
+        f"**Time Frame:** {practice.time_frame}\n"
+        f"**Organization:** {practice.organization}\n"
+        f"**Challenge:** {practice.challenge}\n"
+        f"**Problem:** {practice.problem}\n"
+        f"**Solution:** {practice.solution}\n"
+        "**Implementation Steps:**\n"
+    )
+    _write_numbered(buf, practice.implementation_steps)
+    buf.write(
+        f"**Results:** {practice.results}\n"
+        f"**Categorical Tags:** {', '.join(practice.categorical_tags)}\n"
+        f"**Reference:** {practice.reference}"
+    )
+    return buf.getvalue()
+
+
+class BestPracticesAgent(BaseAgent):
+    __slots__ = ()
+
+    def get_system_prompt(self) -> str:
+        return _BEST_PRACTICES_SYSTEM_PROMPT
 
     def format_prompt(self, input_data: Dict[str, Any]) -> str:
         strategic_question = input_data.get('strategic_question', 'N/A')
@@ -126,121 +238,116 @@ Output Guidelines
         problem_context = ""
         if problem_explorer_output:
             # Extract content from Phase 1: Define the Problem
-            phase1_content = problem_explorer_output.get('phase1', {}).get('content', [])
-            if phase1_content:
-                problem_context += "\n".join(phase1_content)
+            problem_context = "\n".join(problem_explorer_output.get('phase1', {}).get('content', []))
             
             # Optionally, add acknowledgment or other relevant parts
             acknowledgment = problem_explorer_output.get('acknowledgment', '')
             if acknowledgment:
                 problem_context = f"{acknowledgment}\n{problem_context}" # Prepend acknowledgment
         
-        return f"""Strategic Question: {strategic_question}
-Time Frame: {time_frame}
-Region/Scope: {region}
-
-Problem Context:
-{problem_context if problem_context else 'Problem context not available from Problem Explorer.'}
-
-Please provide 3 best practices and a next practice recommendation."""
+        return _PROMPT_TEMPLATE.substitute(
+            strategic_question=strategic_question,
+            time_frame=time_frame,
+            region=region,
+            problem_context=problem_context or 'Problem context not available from Problem Explorer.'
+        )
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
             prompt = self.format_prompt(input_data)
-            response, token_usage = await self.invoke_llm(prompt)
-            
-            # Extract references from the response
-            references = self._extract_references(response)
+            response, token_usage, structured = await self._fetch_structured(
+                prompt, input_data.get('strategic_question')
+            )
             
-            # Parse practices (basic implementation)
-            parsed_practices_list = self._parse_practices(response)
+            if structured is None:
+                # Still not schema-conformant after the retries: keep whatever the JSON has
+                structured = _parse_lenient(response)
+            if structured is None:
+                logger.error("BestPracticesAgent: response is not a JSON object, %d characters", len(response))
+                return {
+                    "status": "error",
+                    "error": "Best practices response is not valid JSON",
+                    "agent_type": self.__class__.__name__
+                }
             
             return self.format_output({
                 "raw_response": response,
-                "parsed_practices": parsed_practices_list,
-                "references": references,
+                "structured_response": structured,
                 "token_usage": token_usage
             })
             
         except Exception as e:
-            logger.error(f"Error in BestPracticesAgent: {str(e)}")
+            logger.error("Error in BestPracticesAgent: %s", e, exc_info=True)
             return {
                 "status": "error",
                 "error": str(e),
                 "agent_type": self.__class__.__name__
             }
 
-    def _extract_references(self, response: str) -> list:
-        """Extract references from the response"""
-        import re
-        references = []
-        
-        # Look for **Reference:** lines
-        reference_pattern = r'\*\*Reference:\*\*\s*([^\n]+)'
-        matches = re.findall(reference_pattern, response, re.IGNORECASE)
-        
-        for i, match in enumerate(matches, 1):
-            references.append({
-                "id": i,
-                "title": f"Best Practice {i} Reference",
-                "source": match.strip()
-            })
-        
-        return references
+    async def _fetch_structured(self, prompt: str, question: Optional[str] = None) -> Tuple[str, int, Optional[BestPracticesResponse]]:
+        """Request schema-constrained JSON, feeding validation errors back to the model.
 
-    def _parse_practices(self, response: str) -> list:
-        """Basic parsing of practices from response"""
-        practices = []
-        
-        # Simple implementation - split by ### Best Practice
-        import re
-        practice_sections = re.split(r'### Best Practice \d+:', response)
-        
-        for i, section in enumerate(practice_sections[1:], 1):  # Skip first empty split
-            lines = section.strip().split('\n')
-            if lines:
-                title = lines[0].strip() if lines else f"Practice {i}"
-                practices.append({
-                    "number": i,
-                    "title": title,
-                    "content": section.strip()
-                })
-        
-        return practices
+        Makes up to _MAX_SCHEMA_RETRIES + 1 billed calls. Returns the last
+        response and the tokens spent on all attempts; the parsed response is
+        None if every attempt failed validation.
+        """
+        attempt_prompt = prompt
+        total_tokens = 0
+        for attempt in range(_MAX_SCHEMA_RETRIES + 1):
+            response, token_usage = await self.invoke_llm(attempt_prompt, response_schema=_BEST_PRACTICES_SCHEMA, question=question)
+            total_tokens += token_usage
+            try:
+                return response, total_tokens, BestPracticesResponse.model_validate_json(response)
+            except ValidationError as e:
+                error = e
+            if attempt == _MAX_SCHEMA_RETRIES:
+                break
+            logger.warning("BestPracticesAgent: invalid structured output (attempt %d): %d error(s)", attempt + 1, error.error_count())
+            attempt_prompt = f"{prompt}\n\nYour previous output had an error: {error}. Fix it and return valid JSON."
+            await asyncio.sleep(1.0 * (attempt + 1))
+        return response, total_tokens, None
 
     def format_output(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Format the output in a structured way."""
+        """Format the output in a structured way.
+
+        data holds the raw response, the BestPracticesResponse parsed from it
+        and the token usage.
+        """
         raw_response = data.get("raw_response", "")
-        # Get the list of practices that process() would have parsed
-        structured_practices_list = data.get("parsed_practices", [])
-        # Get extracted references
-        references = data.get("references", [])
+        structured = data["structured_response"]
         token_usage = data.get("token_usage", 0)
         
-        # Create a human-readable markdown format that matches the raw output
-        markdown_output = " \n\n"
+        buf = io.StringIO()
+        buf.write(" \n\n")
         
-        # Split the raw response into sections
-        raw_response = raw_response.replace("###", "#")
-        sections = raw_response.split("\n\n")
+        structured_practices_list = []
+        sources = []
+        for i, practice in enumerate(structured.practices, 1):
+            body = _practice_body(practice)
+            source = practice.reference.strip()
+            if source:
+                sources.append((i, source))
+            structured_practices_list.append({
+                "number": i,
+                "title": practice.title,
+                "content": body
+            })
+            buf.write(f"# Best Practice {i}: {body}\n\n---\n\n")
         
-        for section in sections:
-            if section.strip():
-                # Add each section as is, preserving the original format
-                markdown_output += f"{section}\n\n"
-                
-                # Add a separator between best practices for better readability
-                if "### Best Practice" in section and "### Next Practice" not in section:
-                    markdown_output += "---\n\n"
+        next_practice = structured.next_practice
+        buf.write(f"# Next Practice Recommendation\n{next_practice.recommendation}\n\n# Key Implementation Steps\n")
+        _write_numbered(buf, next_practice.key_implementation_steps)
+        buf.write("\n# Success Metrics\n")
+        _write_numbered(buf, next_practice.success_metrics)
+        buf.write("\n")
         
         return {
             "status": "success",
             "data": {
                 "structured_practices": structured_practices_list, # Key for downstream
-                "references": references, # References for display
-                "raw_sections": {"raw_response": raw_response}, # Keep old raw_sections structure for compatibility if needed, or deprecate
+                "references": _unique_references(sources),
                 "raw_response": raw_response, # Direct access to raw response
-                "formatted_output": markdown_output,
+                "formatted_output": buf.getvalue(),
                 "token_usage": token_usage
             }
-        }
\ No newline at end of file
+        }
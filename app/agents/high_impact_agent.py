@@ -1,22 +1,188 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 from .base_agent import BaseAgent
 import json
-import re
 import asyncio
 import logging
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
 
 logger = logging.getLogger(__name__)
 
-class HighImpactAgent(BaseAgent):
-    def __init__(self):
-        super().__init__()
-        # Increase timeout for High Impact Agent as it processes complex data
-        self.timeout = 60  # Increase from 15 to 60 seconds
-        self.max_retries = 2  # Reduce retries but increase timeout
-        self.retry_delay = 2  # Increase retry delay
-
-    def get_system_prompt(self) -> str:
-        return """You are the High-Impact Initiatives Agent, an execution-focused strategist responsible for transforming high-priority actions (from the Strategic Action Planning Agent) into fully detailed, implementation-ready strategic blueprints.
+# Perf notes: the hot path is the LLM round trip plus line-by-line string
+# parsing; there are no numeric loops, so Numba/Cython have nothing to compile
+# and would only add a heavy dependency. Time goes into the per-horizon
+# concurrent calls, the shared prompt cache and the timeout/retry settings instead.
+
+# Per-attempt LLM timeout (seconds) unless HIGH_IMPACT_LLM_TIMEOUT overrides it
+_DEFAULT_LLM_TIMEOUT = 20
+
+# Latencies (seconds) of recent successful LLM calls, logged as a p95 to help
+# tune HIGH_IMPACT_LLM_TIMEOUT
+_LLM_LATENCIES = deque(maxlen=50)
+
+# Label of a '**Label:** text' header line -> blueprint key
+_BLUEPRINT_FIELDS = {
+    'Title': 'title',
+    'Time Horizon': 'time_horizon',
+    'Why Important': 'why_important',
+    'Who It Impacts': 'who_it_impacts',
+    'Estimated Cost': 'estimated_cost',
+    'Success Metrics': 'success_metrics',
+    'Immediate Tasks': 'immediate_tasks'
+}
+# Values for fields a parsed blueprint is missing, in the order they are added
+_BLUEPRINT_DEFAULTS = (
+    ('success_metrics', ("Implementation progress tracked", "Stakeholder feedback collected")),
+    ('immediate_tasks', ("Define scope", "Assemble team", "Secure resources", "Create timeline", "Begin implementation")),
+    ('why_important', "Addresses strategic priorities identified in analysis"),
+    ('who_it_impacts', "Key organizational stakeholders"),
+    ('estimated_cost', "Medium - requires dedicated resources"),
+    ('time_horizon', "Near-Term")
+)
+# Fields whose text may continue on the following lines
+_MULTILINE_FIELDS = frozenset(('why_important', 'who_it_impacts', 'estimated_cost'))
+# Time Horizon header text -> one shared canonical string; the usual case and
+# spacing variants snap to it, anything else is interned as-is
+_KNOWN_HORIZONS = {
+    variant: canonical
+    for canonical in map(sys.intern, ("Near-Term", "Medium-Term", "Long-Term"))
+    for variant in (canonical, canonical.lower(), canonical.replace('-', ' '), canonical.lower().replace('-', ' '))
+}
+
+
+
+# Fallback initiatives for a plan without action items, for an LLM timeout, and
+# the standard set used when the response does not parse into 3 initiatives.
+# Handed out through _copy_initiatives so callers never share these objects.
+_NO_ACTIONS_INITIATIVES = ({
+    "title": "Strategic Implementation Framework",
+    "time_horizon": "Near-Term",
+    "why_important": "Addresses immediate strategic needs identified in the analysis",
+    "who_it_impacts": "Organization stakeholders and key decision makers",
+    "estimated_cost": "Medium - requires dedicated resources and coordination",
+    "success_metrics": [
+        "Implementation progress tracked weekly",
+        "Stakeholder satisfaction measured quarterly"
+    ],
+    "immediate_tasks": [
+        "Define project scope and objectives",
+        "Assemble implementation team",
+        "Secure necessary resources and budget",
+        "Create detailed project timeline",
+        "Establish success measurement framework"
+    ]
+},)
+
+_TIMEOUT_INITIATIVES = ({
+    "title": "Strategic Implementation Plan (Fallback)",
+    "time_horizon": "Near-Term",
+    "why_important": "Immediate action required based on strategic analysis - LLM processing timed out",
+    "who_it_impacts": "All identified stakeholders from strategic action plan",
+    "estimated_cost": "Medium - requires coordination of existing resources",
+    "success_metrics": [
+        "Initial implementation milestones achieved",
+        "Team coordination established successfully"
+    ],
+    "immediate_tasks": [
+        "Review strategic action recommendations",
+        "Identify immediate priority actions",
+        "Allocate team resources for implementation",
+        "Set up progress tracking systems",
+        "Begin execution of highest priority items"
+    ]
+},)
+
+_STANDARD_INITIATIVES = (
+    {
+        "title": "Near-Term User Experience Enhancement",
+        "time_horizon": "Near-Term",
+        "why_important": "Immediate improvements to user experience and engagement through personalization and interface enhancements",
+        "who_it_impacts": "All users, UX/UI teams, engineering teams, data science teams",
+        "estimated_cost": "Medium - requires coordination of existing development resources",
+        "success_metrics": [
+            "User engagement metrics improve by 15% within 6 months",
+            "User interface satisfaction scores increase by 20%",
+            "Recommendation accuracy improvements measured quarterly"
+        ],
+        "immediate_tasks": [
+            "Conduct comprehensive user experience audit and gather feedback",
+            "Form cross-functional team for UI/UX improvements and personalization",
+            "Define success metrics and tracking systems for user engagement",
+            "Begin algorithm refinements and interface redesign planning",
+            "Establish A/B testing framework for continuous optimization"
+        ]
+    },
+    {
+        "title": "Medium-Term Content Strategy and Social Features",
+        "time_horizon": "Medium-Term",
+        "why_important": "Strategic expansion of content offerings and social engagement features to build competitive advantage",
+        "who_it_impacts": "Content teams, social feature developers, marketing teams, international users",
+        "estimated_cost": "High - requires significant investment in content acquisition and feature development",
+        "success_metrics": [
+            "Local content engagement increases by 25% in target markets",
+            "Social feature adoption reaches 30% of user base within 2 years",
+            "Content variety and satisfaction scores improve across all regions"
+        ],
+        "immediate_tasks": [
+            "Conduct market research for local content preferences and opportunities",
+            "Develop social features roadmap and technical requirements",
+            "Establish partnerships with local content providers and creators",
+            "Design community management and user engagement strategies",
+            "Create content acquisition and localization framework"
+        ]
+    },
+    {
+        "title": "Long-Term Strategic Partnerships and Innovation",
+        "time_horizon": "Long-Term",
+        "why_important": "Foundational partnerships and innovative content strategies for sustained competitive advantage",
+        "who_it_impacts": "Executive leadership, business development, content strategy teams, global partners",
+        "estimated_cost": "Very High - requires sustained investment and strategic partnerships",
+        "success_metrics": [
+            "Strategic partnerships established with 5+ major global content providers",
+            "Original content portfolio generates 40% of total engagement",
+            "Market leadership position established in 3+ new geographic regions"
+        ],
+        "immediate_tasks": [
+            "Identify and evaluate potential strategic partners for content creation",
+            "Develop long-term content strategy and original programming roadmap",
+            "Establish global content creation hubs and talent acquisition plans",
+            "Create partnership evaluation and negotiation framework",
+            "Design innovation labs for emerging content technologies and formats"
+        ]
+    }
+)
+
+
+def _copy_initiatives(initiatives) -> List[Dict[str, Any]]:
+    """Fresh initiative dicts (and metric/task lists) from one of the fallback templates"""
+    return [
+        {key: list(value) if isinstance(value, list) else value for key, value in initiative.items()}
+        for initiative in initiatives
+    ]
+
+
+def _numbered_item_text(line: str) -> Optional[str]:
+    """Text after a leading '<n>.' item number, or None if line is not numbered"""
+    end = 0
+    while end < len(line) and line[end].isdecimal():
+        end += 1
+    if end and line[end:end + 1] == '.':
+        return line[end + 1:].lstrip()
+    return None
+
+
+# Time horizon -> key of its ideas in the Strategic Action plan
+_HORIZON_IDEA_KEYS = (
+    ("Near-Term", "near_term_ideas"),
+    ("Medium-Term", "medium_term_ideas"),
+    ("Long-Term", "long_term_ideas")
+)
+
+
+_HIGH_IMPACT_SYSTEM_PROMPT = """You are the High-Impact Initiatives Agent, an execution-focused strategist responsible for transforming high-priority actions (from the Strategic Action Planning Agent) into fully detailed, implementation-ready strategic blueprints.
 
 Your mission is to:
 - Translate high-priority actions into practical, well-justified, and resource-aware initiatives.
@@ -68,7 +234,7 @@ List five specific, sequential action steps that can begin implementation within
 5. [Action Step] – Communication or change management actions
 
 CRITICAL OUTPUT FORMAT REQUIREMENTS
-You MUST create exactly 3 initiatives using this exact format:
+You MUST create exactly one initiative for each time horizon you are asked about, using this exact format (shown here for all three horizons):
 
 **Title:** [Descriptive Title for Near-Term Initiative]
 **Time Horizon:** Near-Term
@@ -127,100 +293,15 @@ Guidelines for the Agent
 * Ensure feasibility & sequencing – All actions should be practical, prioritized, and time-horizon appropriate.
 * Use clear, decision-ready language – Write for leaders and execution teams who need immediate clarity on what to do, when, and why."""
 
-    def _convert_list_to_string_for_prompt(self, items: List[str]) -> str:
-        if not items:
-            return "N/A"
-        return "\n- " + "\n- ".join(items)
+# Fixed tail of each per-horizon prompt, keyed on the time horizon
+_HORIZON_PROMPT_INSTRUCTIONS = {
+    horizon: f"""
+INSTRUCTIONS: Create exactly 1 comprehensive initiative, for the {horizon} time horizon only; the other time horizons are covered separately. It should combine ALL the high-priority actions above into one strategic implementation plan.
 
-    def format_prompt(self, input_data: Dict[str, Any]) -> str:
-        strategic_question = input_data.get('strategic_question', 'N/A')
-        
-        # Extract Strategic Action Agent output
-        strategic_action_data = input_data.get('strategic_action', {}).get('data', {})
-        
-        # Flexibly find the action plan data
-        action_plan_sections = {}
-        if 'structured_action_plan' in strategic_action_data:
-            action_plan_sections = strategic_action_data.get('structured_action_plan', {})
-        elif 'near_term_ideas' in strategic_action_data: # Check if the keys exist at the top level of 'data'
-            action_plan_sections = strategic_action_data
-        else:
-            logger.warning("Could not find 'structured_action_plan' or time-based ideas in strategic_action data.")
-
-        # Group high-priority items by time horizon
-        high_priority_by_horizon = {
-            "Near-Term": [],
-            "Medium-Term": [],
-            "Long-Term": []
-        }
-        
-        # Also collect all items in case there are no high-priority ones
-        all_actions_by_horizon = {
-            "Near-Term": [],
-            "Medium-Term": [],
-            "Long-Term": []
-        }
-        
-        for time_horizon, key in [
-            ("Near-Term", "near_term_ideas"),
-            ("Medium-Term", "medium_term_ideas"), 
-            ("Long-Term", "long_term_ideas")
-        ]:
-            ideas = action_plan_sections.get(key, [])
-            for idea in ideas:
-                # Extract high-priority action items from this idea
-                for action_item in idea.get('action_items', []):
-                    action_details = {
-                        'strategic_idea': idea.get('idea_title', 'N/A'),
-                        'idea_summary': idea.get('idea_summary', 'N/A'),
-                        'action': action_item.get('action', 'N/A')
-                    }
-                    all_actions_by_horizon[time_horizon].append(action_details)
-                    if action_item.get('priority', '').lower() == 'high':
-                        high_priority_by_horizon[time_horizon].append(action_details)
-        
-        # Use high-priority actions if available, otherwise use all actions
-        actions_to_process = high_priority_by_horizon
-        if not any(actions for actions in high_priority_by_horizon.values()):
-            logger.info("No high-priority actions found. Using all available actions as a fallback.")
-            actions_to_process = all_actions_by_horizon
-
-        # Format high-priority items by time horizon for creating 3 initiatives
-        high_priority_text = "\n\nHigh-Priority Actions Grouped by Time Horizon (for creating 3 initiatives):\n"
-        
-        for horizon, actions in actions_to_process.items():
-            high_priority_text += f"\n=== {horizon} High-Priority Actions ===\n"
-            if actions:
-                for i, action in enumerate(actions, 1):
-                    high_priority_text += f"{i}. Strategic Idea: {action['strategic_idea']}\n"
-                    high_priority_text += f"   Summary: {action['idea_summary']}\n"
-                    high_priority_text += f"   Action: {action['action']}\n\n"
-            else:
-                high_priority_text += f"No high-priority actions identified for {horizon} timeframe.\n\n"
-        
-        # Also include research synthesis insights if available
-        research_synthesis = input_data.get('research_synthesis', {}).get('data', {}).get('structured_synthesis', {})
-        insights_text = ""
-        if research_synthesis:
-            insights_text = "\n\nKey Research Insights:\n"
-            for key, items in research_synthesis.items():
-                if items and isinstance(items, list):
-                    insights_text += f"\n{key.replace('_', ' ').title()}:\n"
-                    for item in items[:3]:  # Limit to top 3 items
-                        insights_text += f"- {item}\n"
-
-        return f"""Original Problem Statement: {strategic_question}
-
-Additional Context: {input_data.get('prompt', 'None provided')}
-{high_priority_text}
-{insights_text}
-
-INSTRUCTIONS: Create exactly 3 comprehensive initiatives - one for each time horizon. Each initiative should combine ALL the high-priority actions within that time horizon into one strategic implementation plan.
-
-For each time horizon that has high-priority actions, create ONE initiative using this format:
+Use this format:
 
 **Title:** [Descriptive title combining all actions in this time horizon]
-**Time Horizon:** [Near-Term/Medium-Term/Long-Term]
+**Time Horizon:** {horizon}
 **Why Important:** [Explain why ALL actions in this time horizon are strategically important]
 **Who It Impacts:** [All stakeholders affected by actions in this time horizon]
 **Estimated Cost:** [Combined resource requirements for all actions in this time horizon]
@@ -236,16 +317,43 @@ For each time horizon that has high-priority actions, create ONE initiative usin
 4. [Task that initiates multiple actions in this time horizon]
 5. [Task that initiates multiple actions in this time horizon]
 
-Create exactly 3 initiatives total. Make titles specific and descriptive based on the actual high-priority actions in each time horizon."""
+Make the title specific and descriptive based on the actual high-priority actions."""
+    for horizon, _ in _HORIZON_IDEA_KEYS
+}
 
-    def _parse_blueprints(self, response: str) -> List[Dict[str, Any]]:
-        """Parse the text-based blueprint format from LLM response"""
-        blueprints = []
-        lines = response.split('\n')
-        current_blueprint = {}
-        current_tasks = []
-        current_metrics = []
-        current_field = None
+
+class _BlueprintParser:
+    """Line-by-line blueprint parser that can be fed a response as it streams in.
+
+    feed() takes raw text chunks and holds back an unterminated last line;
+    consume() takes complete lines. finish() returns the blueprints.
+    """
+
+    __slots__ = ('blueprints', 'current_blueprint', 'current_tasks', 'current_metrics', 'current_field', 'pending')
+
+    def __init__(self):
+        self.blueprints = []
+        self.current_blueprint = {}
+        self.current_tasks = []
+        self.current_metrics = []
+        self.current_field = None
+        self.pending = ""
+
+    def feed(self, chunk: str) -> None:
+        lines = (self.pending + chunk).splitlines(keepends=True)
+        # An empty line left by a \r\n split across chunks is skipped anyway
+        if lines and lines[-1].splitlines()[0] == lines[-1]:
+            self.pending = lines.pop()
+        else:
+            self.pending = ""
+        self.consume(lines)
+
+    def consume(self, lines) -> None:
+        blueprints = self.blueprints
+        current_blueprint = self.current_blueprint
+        current_tasks = self.current_tasks
+        current_metrics = self.current_metrics
+        current_field = self.current_field
         
         for line in lines:
             line = line.strip()
@@ -253,58 +361,45 @@ Create exactly 3 initiatives total. Make titles specific and descriptive based o
                 continue
             
             # Check for field headers
-            if line.startswith('**Title:**'):
-                # Save previous blueprint if exists
-                if current_blueprint and 'title' in current_blueprint:
-                    if current_tasks:
-                        current_blueprint['immediate_tasks'] = current_tasks[:]
-                    if current_metrics:
-                        current_blueprint['success_metrics'] = current_metrics[:]
-                    blueprints.append(current_blueprint)
-                
-                # Start new blueprint
-                current_blueprint = {}
-                current_tasks = []
-                current_metrics = []
-                title_text = line.replace('**Title:**', '').strip()
-                current_blueprint['title'] = title_text
-                current_field = None
-                
-            elif line.startswith('**Time Horizon:**'):
-                horizon_text = line.replace('**Time Horizon:**', '').strip()
-                current_blueprint['time_horizon'] = horizon_text
-                current_field = None
-                
-            elif line.startswith('**Why Important:**'):
-                important_text = line.replace('**Why Important:**', '').strip()
-                current_blueprint['why_important'] = important_text
-                current_field = 'why_important'
-                
-            elif line.startswith('**Who It Impacts:**'):
-                impacts_text = line.replace('**Who It Impacts:**', '').strip()
-                if impacts_text:
-                    current_blueprint['who_it_impacts'] = impacts_text
+            field = None
+            if line.startswith('**'):
+                label, found, text = line[2:].partition(':**')
+                if found:
+                    field = _BLUEPRINT_FIELDS.get(label)
+            
+            if field is not None:
+                text = text.lstrip()
+                if field == 'title':
+                    # Save previous blueprint if exists
+                    if current_blueprint and 'title' in current_blueprint:
+                        if current_tasks:
+                            current_blueprint['immediate_tasks'] = current_tasks
+                        if current_metrics:
+                            current_blueprint['success_metrics'] = current_metrics
+                        blueprints.append(current_blueprint)
+                    
+                    # Start new blueprint
+                    current_blueprint = {'title': text}
+                    current_tasks = []
+                    current_metrics = []
+                    current_field = None
+                elif field == 'success_metrics':
+                    current_field = field
+                    current_metrics = []
+                elif field == 'immediate_tasks':
+                    current_field = field
+                    current_tasks = []
+                elif field == 'time_horizon':
+                    current_blueprint[field] = _KNOWN_HORIZONS.get(text) or sys.intern(text)
+                    current_field = None
                 else:
-                    current_blueprint['who_it_impacts'] = ""
-                current_field = 'who_it_impacts'
-                
-            elif line.startswith('**Estimated Cost:**'):
-                cost_text = line.replace('**Estimated Cost:**', '').strip()
-                current_blueprint['estimated_cost'] = cost_text
-                current_field = 'estimated_cost'
-                
-            elif line.startswith('**Success Metrics:**'):
-                current_field = 'success_metrics'
-                current_metrics = []
-                
-            elif line.startswith('**Immediate Tasks:**'):
-                current_field = 'immediate_tasks'
-                current_tasks = []
+                    current_blueprint[field] = text
+                    current_field = field if field in _MULTILINE_FIELDS else None
                 
             elif current_field == 'immediate_tasks':
                 # Handle numbered tasks
-                if re.match(r'^\d+\.', line):
-                    task_text = re.sub(r'^\d+\.\s*', '', line)
+                task_text = _numbered_item_text(line)
+                if task_text is not None:
                     current_tasks.append(task_text)
                 elif line.startswith('- '):
                     current_tasks.append(line[2:])
@@ -317,13 +412,27 @@ Create exactly 3 initiatives total. Make titles specific and descriptive based o
                     # Continue previous metric or add as new one
                     current_metrics.append(line)
                 
-            elif current_field and not line.startswith('**') and not re.match(r'^\d+\.', line):
+            elif current_field and not line.startswith('**') and _numbered_item_text(line) is None:
                 # Continue previous field content
                 if current_field in current_blueprint:
                     current_blueprint[current_field] += ' ' + line
                 else:
                     current_blueprint[current_field] = line
         
+        self.current_blueprint = current_blueprint
+        self.current_tasks = current_tasks
+        self.current_metrics = current_metrics
+        self.current_field = current_field
+
+    def finish(self) -> List[Dict[str, Any]]:
+        if self.pending:
+            self.consume((self.pending,))
+            self.pending = ""
+        blueprints = self.blueprints
+        current_blueprint = self.current_blueprint
+        current_tasks = self.current_tasks
+        current_metrics = self.current_metrics
+        
         # Save last blueprint
         if current_blueprint and 'title' in current_blueprint:
             if current_tasks:
@@ -334,58 +443,191 @@ Create exactly 3 initiatives total. Make titles specific and descriptive based o
         
         # Ensure all blueprints have required fields
         for blueprint in blueprints:
-            if 'success_metrics' not in blueprint:
-                blueprint['success_metrics'] = ["Implementation progress tracked", "Stakeholder feedback collected"]
-            if 'immediate_tasks' not in blueprint:
-                blueprint['immediate_tasks'] = ["Define scope", "Assemble team", "Secure resources", "Create timeline", "Begin implementation"]
-            if 'why_important' not in blueprint:
-                blueprint['why_important'] = "Addresses strategic priorities identified in analysis"
-            if 'who_it_impacts' not in blueprint:
-                blueprint['who_it_impacts'] = "Key organizational stakeholders"
-            if 'estimated_cost' not in blueprint:
-                blueprint['estimated_cost'] = "Medium - requires dedicated resources"
-            if 'time_horizon' not in blueprint:
-                blueprint['time_horizon'] = "Near-Term"
+            for field, default in _BLUEPRINT_DEFAULTS:
+                if field not in blueprint:
+                    # List defaults are stored as tuples; each blueprint gets its own list
+                    blueprint[field] = list(default) if isinstance(default, tuple) else default
         
         return blueprints
 
+
+class HighImpactAgent(BaseAgent):
+    __slots__ = ('retry_delay',)
+
+    def __init__(self):
+        super().__init__()
+        # Per-attempt timeout a little above typical latency: a slow outlier is
+        # retried rather than waited out, all within BaseAgent's total_budget.
+        # Each call generates a single initiative, so 20s is ample, and 2 attempts
+        # plus backoff stay inside the orchestrator's 60s cap
+        self.timeout = self._timeout_from_env()
+        self.max_retries = 2
+        self.retry_delay = 2  # Increase retry delay
+
+    @staticmethod
+    def _timeout_from_env() -> int:
+        """HIGH_IMPACT_LLM_TIMEOUT in seconds, or the default if it is unset or invalid"""
+        value = os.getenv("HIGH_IMPACT_LLM_TIMEOUT")
+        if value is None:
+            return _DEFAULT_LLM_TIMEOUT
+        try:
+            timeout = int(value)
+        except ValueError:
+            timeout = 0
+        if timeout <= 0:
+            logger.warning("Ignoring invalid HIGH_IMPACT_LLM_TIMEOUT=%r, using %ds", value, _DEFAULT_LLM_TIMEOUT)
+            return _DEFAULT_LLM_TIMEOUT
+        return timeout
+
+    def get_system_prompt(self) -> str:
+        return _HIGH_IMPACT_SYSTEM_PROMPT
+
+    def _convert_list_to_string_for_prompt(self, items: List[str]) -> str:
+        if not items:
+            return "N/A"
+        return "\n- " + "\n- ".join(items)
+
+    def _find_action_plan(self, strategic_action_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Flexibly find the action plan data in the Strategic Action Agent output"""
+        if 'structured_action_plan' in strategic_action_data:
+            return strategic_action_data.get('structured_action_plan', {})
+        if 'near_term_ideas' in strategic_action_data: # Check if the keys exist at the top level of 'data'
+            return strategic_action_data
+        logger.warning("Could not find 'structured_action_plan' or time-based ideas in strategic_action data.")
+        return {}
+
+    def _group_actions(self, action_plan_sections: Dict[str, Any]) -> Tuple[Dict[str, list], Dict[str, list]]:
+        """Group the action items by time horizon: (high-priority only, all).
+
+        Each action is a (strategic_idea, idea_summary, action) tuple.
+        """
+        high_priority_by_horizon = {}
+        # Also collect all items in case there are no high-priority ones
+        all_actions_by_horizon = {}
+        
+        for time_horizon, key in _HORIZON_IDEA_KEYS:
+            high_priority = high_priority_by_horizon[time_horizon] = []
+            all_actions = all_actions_by_horizon[time_horizon] = []
+            for idea in action_plan_sections.get(key, []):
+                get = idea.get
+                strategic_idea = get('idea_title', 'N/A')
+                idea_summary = get('idea_summary', 'N/A')
+                for action_item in get('action_items', ()):
+                    item_get = action_item.get
+                    action_details = (strategic_idea, idea_summary, item_get('action', 'N/A'))
+                    all_actions.append(action_details)
+                    priority = item_get('priority')
+                    if priority and priority.lower() == 'high':
+                        high_priority.append(action_details)
+        
+        return high_priority_by_horizon, all_actions_by_horizon
+
+    def format_prompt(self, input_data: Dict[str, Any]) -> str:
+        """The per-horizon prompts that process sends, one after the other"""
+        strategic_action_data = input_data.get('strategic_action', {}).get('data', {})
+        horizon_prompts = self._build_horizon_prompts(input_data, *self._group_actions(self._find_action_plan(strategic_action_data)))
+        return "\n\n".join(prompt for _, prompt in horizon_prompts)
+
+    def _actions_to_process(self, high_priority_by_horizon: Dict[str, list],
+                            all_actions_by_horizon: Dict[str, list]) -> Dict[str, list]:
+        """Use high-priority actions if available, otherwise use all actions"""
+        if not any(actions for actions in high_priority_by_horizon.values()):
+            logger.info("No high-priority actions found. Using all available actions as a fallback.")
+            return all_actions_by_horizon
+        return high_priority_by_horizon
+
+    def _append_horizon_actions(self, parts: List[str], horizon: str, actions: List[Tuple[str, str, str]]) -> None:
+        parts.append(f"\n=== {horizon} High-Priority Actions ===\n")
+        if actions:
+            for i, (strategic_idea, idea_summary, action) in enumerate(actions, 1):
+                parts.append(
+                    f"{i}. Strategic Idea: {strategic_idea}\n"
+                    f"   Summary: {idea_summary}\n"
+                    f"   Action: {action}\n\n"
+                )
+        else:
+            parts.append(f"No high-priority actions identified for {horizon} timeframe.\n\n")
+
+    def _insights_text(self, input_data: Dict[str, Any]) -> str:
+        """Research synthesis insights for the prompt, if available"""
+        research_synthesis = input_data.get('research_synthesis', {}).get('data', {}).get('structured_synthesis', {})
+        if not research_synthesis:
+            return ""
+        parts = ["\n\nKey Research Insights:\n"]
+        for key, items in research_synthesis.items():
+            if items and isinstance(items, list):
+                parts.append(f"\n{key.replace('_', ' ').title()}:\n")
+                parts.extend(f"- {item}\n" for item in islice(items, 3))  # Limit to top 3 items
+        return "".join(parts)
+
+    def _build_horizon_prompts(self, input_data: Dict[str, Any], high_priority_by_horizon: Dict[str, list],
+                               all_actions_by_horizon: Dict[str, list]) -> List[Tuple[str, str]]:
+        """(horizon, prompt) pairs asking for the one initiative of each time horizon.
+
+        The problem statement and insights lead every prompt so the three
+        concurrent calls share their prefix.
+        """
+        actions_to_process = self._actions_to_process(high_priority_by_horizon, all_actions_by_horizon)
+        shared_context = f"""Original Problem Statement: {input_data.get('strategic_question', 'N/A')}
+
+Additional Context: {input_data.get('prompt', 'None provided')}
+{self._insights_text(input_data)}
+"""
+        prompts = []
+        for horizon, actions in actions_to_process.items():
+            parts = [shared_context]
+            self._append_horizon_actions(parts, horizon, actions)
+            parts.append(_HORIZON_PROMPT_INSTRUCTIONS[horizon])
+            prompts.append((horizon, "".join(parts)))
+        return prompts
+
+    def _parse_blueprints(self, response: str) -> List[Dict[str, Any]]:
+        """Parse the text-based blueprint format from LLM response"""
+        parser = _BlueprintParser()
+        parser.consume(response.splitlines())
+        return parser.finish()
+
     def format_output(self, blueprints: List[Dict[str, Any]], response: str, token_usage: int = 0) -> Dict[str, Any]:
         """Format the output in a structured way."""
         # Create a human-readable markdown format
-        markdown_output = "\n\n"
+        parts = ["\n\n"]
         
         if not blueprints:
-            markdown_output += "No high-impact initiatives identified.\n"
+            parts.append("No high-impact initiatives identified.\n")
         else:
-            markdown_output += f"# Strategic Implementation Roadmap\n\n"
-            markdown_output += f"This comprehensive roadmap outlines {len(blueprints)} strategic initiatives designed to address high-priority actions across all time horizons.\n\n"
+            parts.append(
+                "# Strategic Implementation Roadmap\n\n"
+                f"This comprehensive roadmap outlines {len(blueprints)} strategic initiatives designed to address high-priority actions across all time horizons.\n\n"
+            )
             
             for i, blueprint in enumerate(blueprints, 1):
                 time_horizon = blueprint.get('time_horizon', 'Not specified')
-                markdown_output += f"# {time_horizon} Initiative: {blueprint.get('title', 'Untitled Initiative')}\n\n"
-                markdown_output += f"**Time Horizon:** {time_horizon}\n\n"
-                markdown_output += f"**Why Important:** {blueprint.get('why_important', 'Not specified')}\n\n"
-                markdown_output += f"**Who It Impacts:** {blueprint.get('who_it_impacts', 'Not specified')}\n\n"
-                markdown_output += f"**Estimated Cost:** {blueprint.get('estimated_cost', 'Not specified')}\n\n"
+                parts.append(
+                    f"# {time_horizon} Initiative: {blueprint.get('title', 'Untitled Initiative')}\n\n"
+                    f"**Time Horizon:** {time_horizon}\n\n"
+                    f"**Why Important:** {blueprint.get('why_important', 'Not specified')}\n\n"
+                    f"**Who It Impacts:** {blueprint.get('who_it_impacts', 'Not specified')}\n\n"
+                    f"**Estimated Cost:** {blueprint.get('estimated_cost', 'Not specified')}\n\n"
+                )
                 
                 # Success Metrics
                 metrics = blueprint.get('success_metrics', [])
                 if metrics:
-                    markdown_output += "# Success Metrics:\n"
-                    for metric in metrics:
-                        markdown_output += f"- {metric}\n"
-                    markdown_output += "\n"
+                    parts.append("# Success Metrics:\n")
+                    parts.extend(f"- {metric}\n" for metric in metrics)
+                    parts.append("\n")
                 
                 # Immediate Tasks
                 tasks = blueprint.get('immediate_tasks', [])
                 if tasks:
-                    markdown_output += "# Immediate Tasks to Begin Implementation:\n"
-                    for j, task in enumerate(tasks, 1):
-                        markdown_output += f"{j}. {task}\n"
-                    markdown_output += "\n"
+                    parts.append("# Immediate Tasks to Begin Implementation:\n")
+                    parts.extend(f"{j}. {task}\n" for j, task in enumerate(tasks, 1))
+                    parts.append("\n")
                 
                 if i < len(blueprints):  # Don't add separator after last item
-                    markdown_output += "---\n\n"
+                    parts.append("---\n\n")
+        
+        markdown_output = "".join(parts)
 
         return {
             "status": "success",
@@ -396,218 +638,138 @@ Create exactly 3 initiatives total. Make titles specific and descriptive based o
                 "token_usage": token_usage
             }
         }
+
+    async def _fetch_blueprints(self, prompt: str, question: Optional[str] = None) -> Tuple[str, int, List[Dict[str, Any]]]:
+        """Response, token usage and parsed blueprints for one prompt.
+
+        The response is parsed while it streams in (see BaseAgent.stream_llm
+        for the timeout, retry and fallback rules); a response from the
+        blocking fallback is parsed once it is complete. The latency of LLM
+        calls is recorded.
+        """
+        started = time.monotonic()
+        parser = _BlueprintParser()
+        response, token_usage, streamed = await self.stream_llm(prompt, parser.feed, question=question)
+        blueprints = parser.finish() if streamed else self._parse_blueprints(response)
+        _LLM_LATENCIES.append(time.monotonic() - started)
+        if logger.isEnabledFor(logging.INFO):
+            latencies = sorted(_LLM_LATENCIES)
+            logger.info("High Impact LLM latency %.1fs, p95 of last %d calls %.1fs",
+                        _LLM_LATENCIES[-1], len(latencies), latencies[int(0.95 * (len(latencies) - 1))])
+        return response, token_usage, blueprints
+
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            logger.info(f"High Impact Agent starting with input keys: {list(input_data.keys())}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("High Impact Agent starting with input keys: %s", list(input_data.keys()))
             
             # DETAILED DIAGNOSTIC LOGGING
-            print("\n" + "="*80)
-            print("HIGH IMPACT AGENT - DETAILED DIAGNOSTICS")
-            print("="*80)
-            print(f"Input keys: {list(input_data.keys())}")
-            
-            # Check if strategic_action exists
-            if 'strategic_action' in input_data:
-                print("✓ strategic_action key found in input_data")
-                strategic_action_result = input_data.get('strategic_action', {})
-                print(f"  strategic_action type: {type(strategic_action_result)}")
-                print(f"  strategic_action keys: {list(strategic_action_result.keys()) if isinstance(strategic_action_result, dict) else 'N/A'}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("HIGH IMPACT AGENT - DETAILED DIAGNOSTICS")
                 
-                if isinstance(strategic_action_result, dict) and 'data' in strategic_action_result:
-                    print("✓ data key found in strategic_action")
-                    data = strategic_action_result['data']
-                    print(f"  data keys: {list(data.keys()) if isinstance(data, dict) else 'N/A'}")
+                # Check if strategic_action exists
+                if 'strategic_action' in input_data:
+                    logger.debug("✓ strategic_action key found in input_data")
+                    strategic_action_result = input_data.get('strategic_action', {})
+                    logger.debug("  strategic_action type: %s", type(strategic_action_result))
+                    logger.debug("  strategic_action keys: %s", list(strategic_action_result.keys()) if isinstance(strategic_action_result, dict) else 'N/A')
                     
-                    if isinstance(data, dict):
-                        if 'structured_action_plan' in data:
-                            print("✓ structured_action_plan found in data")
-                            plan = data['structured_action_plan']
-                            print(f"  structured_action_plan keys: {list(plan.keys()) if isinstance(plan, dict) else 'N/A'}")
-                            if isinstance(plan, dict):
+                    if isinstance(strategic_action_result, dict) and 'data' in strategic_action_result:
+                        logger.debug("✓ data key found in strategic_action")
+                        data = strategic_action_result['data']
+                        logger.debug("  data keys: %s", list(data.keys()) if isinstance(data, dict) else 'N/A')
+                        
+                        if isinstance(data, dict):
+                            if 'structured_action_plan' in data:
+                                logger.debug("✓ structured_action_plan found in data")
+                                plan = data['structured_action_plan']
+                                logger.debug("  structured_action_plan keys: %s", list(plan.keys()) if isinstance(plan, dict) else 'N/A')
+                                if isinstance(plan, dict):
+                                    for key in ['near_term_ideas', 'medium_term_ideas', 'long_term_ideas']:
+                                        logger.debug("  %s: %d ideas", key, len(plan.get(key, [])))
+                            else:
+                                logger.debug("✗ structured_action_plan NOT found in data")
+                                logger.debug("  Looking for time-based keys at data level...")
                                 for key in ['near_term_ideas', 'medium_term_ideas', 'long_term_ideas']:
-                                    ideas = plan.get(key, [])
-                                    print(f"  {key}: {len(ideas)} ideas")
-                        else:
-                            print("✗ structured_action_plan NOT found in data")
-                            print(f"  Looking for time-based keys at data level...")
-                            for key in ['near_term_ideas', 'medium_term_ideas', 'long_term_ideas']:
-                                if key in data:
-                                    ideas = data.get(key, [])
-                                    print(f"  {key}: {len(ideas)} ideas found at data level")
+                                    if key in data:
+                                        logger.debug("  %s: %d ideas found at data level", key, len(data.get(key, [])))
+                    else:
+                        logger.debug("✗ data key NOT found in strategic_action")
                 else:
-                    print("✗ data key NOT found in strategic_action")
-            else:
-                print("✗ strategic_action key NOT found in input_data")
-                print(f"Available keys: {list(input_data.keys())}")
-            print("="*80 + "\n")
-            
-            prompt = self.format_prompt(input_data)
-            logger.info(f"Generated prompt length: {len(prompt)} characters")
+                    logger.debug("✗ strategic_action key NOT found in input_data")
             
-            # Check if we have strategic action data
+            # Check if we have strategic action data; it is grouped once and
+            # reused for both the counts and the prompts below
             strategic_action_data = input_data.get('strategic_action', {}).get('data', {})
-
-            # Flexibly find the action plan data
-            action_plan_sections = {}
-            if 'structured_action_plan' in strategic_action_data:
-                action_plan_sections = strategic_action_data.get('structured_action_plan', {})
-            elif 'near_term_ideas' in strategic_action_data: # Check if the keys exist at the top level of 'data'
-                action_plan_sections = strategic_action_data
+            action_plan_sections = self._find_action_plan(strategic_action_data)
+            high_priority_by_horizon, all_actions_by_horizon = self._group_actions(action_plan_sections)
             
-            logger.info(f"Strategic action data keys: {list(strategic_action_data.keys())}")
-            logger.info(f"Action plan sections keys: {list(action_plan_sections.keys())}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Strategic action data keys: %s", list(strategic_action_data.keys()))
+                logger.info("Action plan sections keys: %s", list(action_plan_sections.keys()))
             
             # Count high-priority items across all time horizons
-            high_priority_count = 0
-            all_actions_count = 0
-            for time_horizon, key in [
-                ("Near-Term", "near_term_ideas"),
-                ("Medium-Term", "medium_term_ideas"), 
-                ("Long-Term", "long_term_ideas")
-            ]:
-                ideas = action_plan_sections.get(key, [])
-                for idea in ideas:
-                    for action_item in idea.get('action_items', []):
-                        all_actions_count += 1
-                        if action_item.get('priority', '').lower() == 'high':
-                            high_priority_count += 1
+            high_priority_count = sum(map(len, high_priority_by_horizon.values()))
+            all_actions_count = sum(map(len, all_actions_by_horizon.values()))
             
-            logger.info(f"Found {high_priority_count} high-priority and {all_actions_count} total action items to process")
+            logger.info("Found %d high-priority and %d total action items to process", high_priority_count, all_actions_count)
             
             # If there are no actions at all, then create a fallback
             if all_actions_count == 0:
                 logger.warning("No action items found, creating fallback")
                 # If no strategic action data, create a basic response
-                fallback_initiatives = [{
-                    "title": "Strategic Implementation Framework",
-                    "time_horizon": "Near-Term",
-                    "why_important": "Addresses immediate strategic needs identified in the analysis",
-                    "who_it_impacts": "Organization stakeholders and key decision makers",
-                    "estimated_cost": "Medium - requires dedicated resources and coordination",
-                    "success_metrics": [
-                        "Implementation progress tracked weekly",
-                        "Stakeholder satisfaction measured quarterly"
-                    ],
-                    "immediate_tasks": [
-                        "Define project scope and objectives",
-                        "Assemble implementation team",
-                        "Secure necessary resources and budget",
-                        "Create detailed project timeline",
-                        "Establish success measurement framework"
-                    ]
-                }]
-                
-                return self.format_output(fallback_initiatives, "No strategic action data available - generated fallback response")
+                return self.format_output(_copy_initiatives(_NO_ACTIONS_INITIATIVES), "No strategic action data available - generated fallback response")
+            
+            # Only built once there is something to prompt for
+            horizon_prompts = self._build_horizon_prompts(input_data, high_priority_by_horizon, all_actions_by_horizon)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Generated %d prompts, %d characters in total",
+                            len(horizon_prompts), sum(len(p) for _, p in horizon_prompts))
             
             # Try to get LLM response with better error handling
             try:
-                logger.info("Invoking LLM for High Impact analysis...")
-                response, token_usage = await self.invoke_llm(prompt)
-                logger.info(f"LLM response received, length: {len(response)} characters")
+                logger.info("Invoking LLM for High Impact analysis, one call per time horizon...")
+                results = await asyncio.gather(
+                    *(self._fetch_blueprints(prompt, input_data.get('strategic_question')) for _, prompt in horizon_prompts),
+                    return_exceptions=True
+                )
+                failures = [(horizon, result) for (horizon, _), result in zip(horizon_prompts, results)
+                            if isinstance(result, BaseException)]
+                if failures:
+                    for horizon, error in failures:
+                        logger.error("LLM call for the %s initiative failed: %s", horizon, error)
+                    # All or nothing, as when one call produced every initiative
+                    raise next((error for _, error in failures if isinstance(error, asyncio.TimeoutError)), failures[0][1])
+                response = "\n\n".join(text for text, _, _ in results)
+                token_usage = sum(tokens for _, tokens, _ in results)
+                # Each response was parsed on its own, in horizon order
+                blueprints = [blueprint for _, _, parsed in results for blueprint in parsed]
+                logger.info("LLM responses received, length: %d characters", len(response))
                     
             except asyncio.TimeoutError:
                 logger.error("LLM request timed out, using fallback response")
                 # Create fallback response for timeout
-                fallback_initiatives = [{
-                    "title": "Strategic Implementation Plan (Fallback)",
-                    "time_horizon": "Near-Term",
-                    "why_important": "Immediate action required based on strategic analysis - LLM processing timed out",
-                    "who_it_impacts": "All identified stakeholders from strategic action plan",
-                    "estimated_cost": "Medium - requires coordination of existing resources",
-                    "success_metrics": [
-                        "Initial implementation milestones achieved",
-                        "Team coordination established successfully"
-                    ],
-                    "immediate_tasks": [
-                        "Review strategic action recommendations",
-                        "Identify immediate priority actions",
-                        "Allocate team resources for implementation",
-                        "Set up progress tracking systems",
-                        "Begin execution of highest priority items"
-                    ]
-                }]
-                
-                return self.format_output(fallback_initiatives, "LLM timeout - generated fallback implementation plan")
+                return self.format_output(_copy_initiatives(_TIMEOUT_INITIATIVES), "LLM timeout - generated fallback implementation plan")
             except Exception as llm_error:
-                logger.error(f"LLM invocation failed: {str(llm_error)}")
+                logger.error("LLM invocation failed: %s", llm_error)
                 return {
                     "status": "error",
                     "error": f"LLM processing failed: {str(llm_error)}",
                     "agent_type": self.__class__.__name__
                 }
             
-            # Parse the text-based blueprints from the response
-            blueprints = self._parse_blueprints(response)
-            logger.info(f"Parsed {len(blueprints)} blueprints from LLM response")
+            logger.info("Parsed %d blueprints from LLM response", len(blueprints))
             
             # Ensure we have exactly 3 initiatives (one per time horizon)
             if len(blueprints) != 3:
-                logger.warning(f"Expected 3 initiatives but got {len(blueprints)}, creating standardized set")
-                blueprints = [
-                    {
-                        "title": "Near-Term User Experience Enhancement",
-                        "time_horizon": "Near-Term",
-                        "why_important": "Immediate improvements to user experience and engagement through personalization and interface enhancements",
-                        "who_it_impacts": "All users, UX/UI teams, engineering teams, data science teams",
-                        "estimated_cost": "Medium - requires coordination of existing development resources",
-                        "success_metrics": [
-                            "User engagement metrics improve by 15% within 6 months",
-                            "User interface satisfaction scores increase by 20%",
-                            "Recommendation accuracy improvements measured quarterly"
-                        ],
-                        "immediate_tasks": [
-                            "Conduct comprehensive user experience audit and gather feedback",
-                            "Form cross-functional team for UI/UX improvements and personalization",
-                            "Define success metrics and tracking systems for user engagement",
-                            "Begin algorithm refinements and interface redesign planning",
-                            "Establish A/B testing framework for continuous optimization"
-                        ]
-                    },
-                    {
-                        "title": "Medium-Term Content Strategy and Social Features",
-                        "time_horizon": "Medium-Term",
-                        "why_important": "Strategic expansion of content offerings and social engagement features to build competitive advantage",
-                        "who_it_impacts": "Content teams, social feature developers, marketing teams, international users",
-                        "estimated_cost": "High - requires significant investment in content acquisition and feature development",
-                        "success_metrics": [
-                            "Local content engagement increases by 25% in target markets",
-                            "Social feature adoption reaches 30% of user base within 2 years",
-                            "Content variety and satisfaction scores improve across all regions"
-                        ],
-                        "immediate_tasks": [
-                            "Conduct market research for local content preferences and opportunities",
-                            "Develop social features roadmap and technical requirements",
-                            "Establish partnerships with local content providers and creators",
-                            "Design community management and user engagement strategies",
-                            "Create content acquisition and localization framework"
-                        ]
-                    },
-                    {
-                        "title": "Long-Term Strategic Partnerships and Innovation",
-                        "time_horizon": "Long-Term",
-                        "why_important": "Foundational partnerships and innovative content strategies for sustained competitive advantage",
-                        "who_it_impacts": "Executive leadership, business development, content strategy teams, global partners",
-                        "estimated_cost": "Very High - requires sustained investment and strategic partnerships",
-                        "success_metrics": [
-                            "Strategic partnerships established with 5+ major global content providers",
-                            "Original content portfolio generates 40% of total engagement",
-                            "Market leadership position established in 3+ new geographic regions"
-                        ],
-                        "immediate_tasks": [
-                            "Identify and evaluate potential strategic partners for content creation",
-                            "Develop long-term content strategy and original programming roadmap",
-                            "Establish global content creation hubs and talent acquisition plans",
-                            "Create partnership evaluation and negotiation framework",
-                            "Design innovation labs for emerging content technologies and formats"
-                        ]
-                    }
-                ]
+                logger.warning("Expected 3 initiatives but got %d, creating standardized set", len(blueprints))
+                blueprints = _copy_initiatives(_STANDARD_INITIATIVES)
             
-            logger.info(f"High Impact Agent completed successfully with exactly {len(blueprints)} initiatives")
+            logger.info("High Impact Agent completed successfully with exactly %d initiatives", len(blueprints))
             return self.format_output(blueprints, response, token_usage)
             
         except Exception as e:
-            logger.error(f"Error in High Impact Agent: {str(e)}")
+            logger.error("Error in High Impact Agent: %s", e)
             return {
                 "status": "error",
                 "error": str(e),
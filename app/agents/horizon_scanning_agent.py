@@ -1,13 +1,18 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Optional, Tuple
 from .base_agent import BaseAgent
 import logging
-import asyncio
+import string
 
 logger = logging.getLogger(__name__)
 
-class HorizonScanningAgent(BaseAgent):
-    def get_system_prompt(self) -> str:
-        return """You are the Strategic Horizon Scanning Agent, a foresight-focused analytical system designed to anticipate emerging change, surface early signals, and map strategic uncertainties.
+# Perf notes: formatting is a str.find walk over sections plus a few substring
+# checks, all of which already run in C, and it overlaps the stream anyway.
+# Numba cannot compile str operations in nopython mode, so a byte-buffer port
+# would trade the LLM-bound request path for JIT warm-up and a numpy/numba
+# dependency. A process pool for batch re-formatting was left out on purpose:
+# starting workers costs far more than formatting a few KB of markdown.
+
+_HORIZON_SCANNING_SYSTEM_PROMPT = """You are the Strategic Horizon Scanning Agent, a foresight-focused analytical system designed to anticipate emerging change, surface early signals, and map strategic uncertainties.
 
 Your mission is to:
 - Identify weak signals and early indicators of disruption or opportunity.
@@ -115,7 +120,80 @@ Output Guidelines
 * Prioritize evidence-based insights over speculation.
 * Always cite sources for credibility."""
 
+# Instructions first and the request's own values last, so every prompt shares
+# the longest possible prefix for provider-side prompt caching
+_PROMPT_TEMPLATE = string.Template("""Identify up to 3 critical Weak Signals, up to 3 Key Uncertainties, and the main Change Drivers (one for each relevant STEEPLED category) for the strategic question, problem context, time frame and region given below.
+Focus on the most impactful and relevant items for the problem context.
+For each Weak Signal and Key Uncertainty, provide a title, domain, a comprehensive 5-sentence description, impact rating, and time frame.
+For each Change Driver, provide a detailed 3-sentence explanation.
+Adhere strictly to the output format sections: ## Weak Signals:, ## Key Uncertainties:, ## Change Drivers: as specified in system instructions.
+
+Strategic question: \"$strategic_question\"
+Core problem context: \"$problem_summary\"
+Time frame: \"$time_frame\"
+Region: \"$region\"""")
+
+# format_output puts a separator after a section with the weak signals or key
+# uncertainties marker, unless it also has the change drivers marker
+_WEAK_SIGNALS_MARKER = "**Weak Signals:**"
+_KEY_UNCERTAINTIES_MARKER = "**Key Uncertainties:**"
+_CHANGE_DRIVERS_MARKER = "**Change Drivers:**"
+
+
+class _SectionFormatter:
+    """Builds format_output's markdown section by section, so a response can be
+    formatted while it streams in.
+
+    feed() takes raw text chunks and holds back the unfinished last section;
+    finish() returns the markdown.
+    """
+
+    __slots__ = ('parts', 'pending')
+
+    def __init__(self):
+        self.parts = ["\n\n"]
+        self.pending = ""
+
+    def feed(self, chunk: str) -> None:
+        text = self.pending + chunk
+        # Sections are the pieces of text.split("\n\n")
+        start = 0
+        end = text.find("\n\n")
+        while end != -1:
+            self._add(text[start:end])
+            start = end + 2
+            end = text.find("\n\n", start)
+        self.pending = text[start:]
+
+    def finish(self) -> str:
+        self._add(self.pending)
+        self.pending = ""
+        return "".join(self.parts)
+
+    def _add(self, section: str) -> None:
+        # '##' never spans a section break, so headers are normalized per section
+        section = section.replace("##", "#")
+        if section.strip():
+            # Add each section as is, preserving the original format
+            self.parts.append(section)
+            self.parts.append("\n\n")
+            
+            # Add a separator between signals and uncertainties for better readability
+            if (_WEAK_SIGNALS_MARKER in section or _KEY_UNCERTAINTIES_MARKER in section) and _CHANGE_DRIVERS_MARKER not in section:
+                self.parts.append("---\n\n")
+
+
+class HorizonScanningAgent(BaseAgent):
+    __slots__ = ()
+
+    def get_system_prompt(self) -> str:
+        return _HORIZON_SCANNING_SYSTEM_PROMPT
+
     def format_prompt(self, input_data: Dict[str, Any]) -> str:
+        return self._render_prompt(self._prompt_slots(input_data))
+
+    def _prompt_slots(self, input_data: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        """(strategic_question, problem_summary, time_frame, region) filled into the prompt template"""
         strategic_question = input_data.get('strategic_question', 'N/A')
         time_frame = input_data.get('time_frame', 'N/A')
         region = input_data.get('region', 'N/A')
@@ -133,31 +211,33 @@ Output Guidelines
                     problem_summary += "..."
             elif problem_explorer_data.get('acknowledgment'):
                  problem_summary = str(problem_explorer_data.get('acknowledgment', '')).strip()
-                 if len(problem_summary.split()) > 40: # Keep acknowledgment summary brief too
-                     ack_words = problem_summary.split()
+                 ack_words = problem_summary.split()
+                 if len(ack_words) > 40: # Keep acknowledgment summary brief too
                      problem_summary = " ".join(ack_words[:40]) + "..."
             if not problem_summary.strip() or problem_summary == "Not available.": # Fallback if phase1 and ack are empty
                 problem_summary = "General context based on strategic question."
 
-        return f"""Given the strategic question: \"{strategic_question}\"
-And the core problem context: \"{problem_summary}\"
-For the time frame \"{time_frame}\" and region \"{region}\":
+        return str(strategic_question), problem_summary, str(time_frame), str(region)
 
-Identify up to 3 critical Weak Signals, up to 3 Key Uncertainties, and the main Change Drivers (one for each relevant STEEPLED category).
-Focus on the most impactful and relevant items for the problem context.
-For each Weak Signal and Key Uncertainty, provide a title, domain, a comprehensive 5-sentence description, impact rating, and time frame.
-For each Change Driver, provide a detailed 3-sentence explanation.
-Adhere strictly to the output format sections: ## Weak Signals:, ## Key Uncertainties:, ## Change Drivers: as specified in system instructions."""
+    @staticmethod
+    def _render_prompt(slots: Tuple[str, str, str, str]) -> str:
+        strategic_question, problem_summary, time_frame, region = slots
+        return _PROMPT_TEMPLATE.substitute(
+            strategic_question=strategic_question,
+            problem_summary=problem_summary,
+            time_frame=time_frame,
+            region=region
+        )
 
     async def process(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            prompt = self.format_prompt(input_data)
-            response, token_usage = await self.invoke_llm(prompt)
+            slots = self._prompt_slots(input_data)
+            response, token_usage, formatted_output = await self._call_llm(self._render_prompt(slots), slots[0])
             
             return self.format_output({
                 "raw_response": response,
                 "token_usage": token_usage
-            })
+            }, formatted_output)
             
         except Exception as e:
             logger.error(f"Error in HorizonScanningAgent: {str(e)}")
@@ -167,32 +247,37 @@ Adhere strictly to the output format sections: ## Weak Signals:, ## Key Uncertai
                 "agent_type": self.__class__.__name__
             }
 
-    def format_output(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """Format the output in a structured way."""
+    async def _call_llm(self, prompt: str, question: Optional[str] = None) -> Tuple[str, int, Optional[str]]:
+        """Response, token usage and, if it streamed, its markdown formatted as it arrived.
+
+        See BaseAgent.stream_llm for the timeout, retry and fallback rules; a
+        response from the blocking fallback comes back with None and is
+        formatted by format_output.
+        """
+        formatter = _SectionFormatter()
+        response, token_usage, streamed = await self.stream_llm(prompt, formatter.feed, question=question)
+        return response, token_usage, formatter.finish() if streamed else None
+
+    def format_output(self, data: Dict[str, Any], formatted_output: Optional[str] = None) -> Dict[str, Any]:
+        """Format the output in a structured way.
+
+        formatted_output is the markdown already built while the response
+        streamed in, if it was.
+        """
         raw_response = data.get("raw_response", "")
         token_usage = data.get("token_usage", 0)
         
         # Create a human-readable markdown format that matches the raw output
-        markdown_output = "\n\n"
-        
-        # Split the raw response into sections
-        raw_response = raw_response.replace("##", "#")
-        sections = raw_response.split("\n\n")
-        
-        for section in sections:
-            if section.strip():
-                # Add each section as is, preserving the original format
-                markdown_output += f"{section}\n\n"
-                
-                # Add a separator between signals and uncertainties for better readability
-                if ("**Weak Signals:**" in section or "**Key Uncertainties:**" in section) and "**Change Drivers:**" not in section:
-                    markdown_output += "---\n\n"
+        if formatted_output is None:
+            formatter = _SectionFormatter()
+            formatter.feed(raw_response)
+            formatted_output = formatter.finish()
         
         return {
             "status": "success",
             "data": {
                 "raw_sections": data,
-                "formatted_output": markdown_output,
+                "formatted_output": formatted_output,
                 "token_usage": token_usage
             }
-        }
\ No newline at end of file
+        }
@@ -40,6 +40,8 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
+_DEFAULT_AGENT_CONCURRENCY = 4
+
 class OrchestratorAgent(BaseAgent):
     def __init__(self):
         super().__init__()
@@ -54,10 +56,18 @@ class OrchestratorAgent(BaseAgent):
             "High Impact": HighImpactAgent(),
             "Backcasting": BackcastingAgent()
         }
+        self.agent_timeout = 60  # Seconds one agent.process() call may take
+        # An agent's LLM calls, retries included, must finish within the time
+        # this layer gives the whole process() call
+        for agent in self.agents.values():
+            agent.total_budget = min(agent.total_budget, self.agent_timeout)
         self.last_request_time = 0
         self.min_request_interval = 7.0  # Minimum time between requests (adjusted for 10 RPM API limit)
         self.max_retries = 3
         self.base_delay = 1.0  # Base delay for exponential backoff
+        # Caps how many agents run process() at once when stages fan out with
+        # asyncio.gather, so parallel stages stay within the provider's rate limit
+        self.agent_semaphore = asyncio.Semaphore(self._concurrency_from_env())
         
         # Database session tracking
         self.current_session_id = None
@@ -76,6 +86,23 @@ class OrchestratorAgent(BaseAgent):
             "Backcasting": "backcasting"
         }
 
+    @staticmethod
+    def _concurrency_from_env() -> int:
+        """AGENT_MAX_CONCURRENCY, the default if it is unset or malformed, and never below 1"""
+        value = os.getenv("AGENT_MAX_CONCURRENCY")
+        if value is None:
+            return _DEFAULT_AGENT_CONCURRENCY
+        try:
+            concurrency = int(value)
+        except ValueError:
+            logger.warning("Ignoring invalid AGENT_MAX_CONCURRENCY=%r, using %d", value, _DEFAULT_AGENT_CONCURRENCY)
+            return _DEFAULT_AGENT_CONCURRENCY
+        if concurrency < 1:
+            # A semaphore of 0 would leave every agent waiting forever
+            logger.warning("AGENT_MAX_CONCURRENCY=%r is below 1, using 1", value)
+            return 1
+        return concurrency
+
     def _test_database_connection(self) -> bool:
         """Test if database is available."""
         if not DATABASE_AVAILABLE:
@@ -358,11 +385,13 @@ Provide a coordinated analysis plan and execution strategy."""
                 # Minimal logging - just progress
                 print(f"{agent_name} started processing...")
                 
-                # Add timeout to the process call
-                result = await asyncio.wait_for(
-                    agent.process(input_data),
-                    timeout=60  # Increased timeout to 60 seconds
-                )
+                # Add timeout to the process call (a slot is taken first, so the
+                # timeout does not count time spent queued behind other agents)
+                async with self.agent_semaphore:
+                    result = await asyncio.wait_for(
+                        agent.process(input_data),
+                        timeout=self.agent_timeout
+                    )
                 
                 # Calculate processing time
                 processing_time = time.time() - agent_start_time
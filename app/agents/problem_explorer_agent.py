@@ -5,6 +5,8 @@ import logging
 logger = logging.getLogger(__name__)
 
 class ProblemExplorerAgent(BaseAgent):
+    __slots__ = ()
+
     def get_system_prompt(self) -> str:
         return """Role & Objective
 You are the Problem Explorer Agent - a strategic analysis specialist trained to deconstruct complex challenges and establish a solid foundation for effective, context-aware solutions.
@@ -9,6 +9,8 @@ logger = logging.getLogger(__name__)
 
 
 class ResearchSynthesisAgent(BaseAgent):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.timeout = 120  # Increased timeout
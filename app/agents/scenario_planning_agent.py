@@ -7,6 +7,8 @@ import re # For parsing
 logger = logging.getLogger(__name__)
 
 class ScenarioPlanningAgent(BaseAgent):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.timeout = 120  # Increased timeout
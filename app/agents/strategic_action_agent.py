@@ -7,6 +7,8 @@ import logging
 logger = logging.getLogger(__name__)
 
 class StrategicActionAgent(BaseAgent):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.timeout = 90  # Increased timeout for this complex agent
@@ -7,13 +7,20 @@ import os
 from dotenv import load_dotenv
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 import time
+import functools
 
 class RateLimitError(Exception):
     """Custom exception for rate limit errors"""
     pass
 
+@functools.cache
 def get_llm():
-    """Get a configured instance of the Google Gemini AI chat model"""
+    """Get the shared, configured Google Gemini AI chat model.
+
+    The client is created once per process and reused by every agent, so its
+    underlying connections are shared too. A missing API key raises and is not
+    cached, so the next call tries again.
+    """
     load_dotenv()
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key: